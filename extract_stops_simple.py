@@ -3,80 +3,289 @@
 Simple extraction of stops from TransXChange XML files for each direction.
 """
 
-import xml.etree.ElementTree as ET
+import functools
+import json
+import logging
+import os
+import sys
+from collections import namedtuple
+
+from lxml import etree
 
 from config import ROUTES_TO_ANALYZE
 
+logger = logging.getLogger(__name__)
+
+# Compact per-stop record - far smaller than a dict and hashable/comparable
+# via fast C slot compares
+Stop = namedtuple("Stop", ["name", "atco_code"])
+
+# Namespace for TransXChange documents
+TXC = "{http://www.transxchange.org.uk/}"
+
+# Clark-notation tags resolved once at module scope - find(TAG) is a plain
+# hashed tag comparison, with no XPath mini-parse or namespace-map walk per call
+ASPR_TAG = TXC + "AnnotatedStopPointRef"
+JP_SECTION_TAG = TXC + "JourneyPatternSection"
+TL_TAG = TXC + "JourneyPatternTimingLink"
+FROM_TAG = TXC + "From"
+TO_TAG = TXC + "To"
+DEST_TAG = TXC + "DynamicDestinationDisplay"
+SPR_TAG = TXC + "StopPointRef"
+CN_TAG = TXC + "CommonName"
+
+
+def _iterparse_and_clear(xml_file, tag):
+    """Stream elements matching tag (a Clark tag or tuple of them),
+    releasing each one (and its already-processed siblings) once the
+    caller has consumed it.
+
+    Blank text, comments and PIs are dropped at parse time so the tree
+    holds only the nodes we query; huge_tree lifts libxml2's safety limits
+    for oversized timetable files.
+    """
+    parse_events = etree.iterparse(
+        xml_file,
+        events=("end",),
+        tag=tag,
+        remove_blank_text=True,
+        remove_comments=True,
+        remove_pis=True,
+        huge_tree=True,
+        collect_ids=False,
+    )
+    for _event, elem in parse_events:
+        yield elem
+        elem.clear()
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+
 
 def get_stops_from_journey_pattern_sections(xml_file):
-    """Extract all stops from JourneyPatternSections organized by direction."""
+    """Extract all stops from JourneyPatternSections organized by direction.
 
-    # Load the XML file
-    tree = ET.parse(xml_file)
-    root = tree.getroot()
+    Memoized per (path, mtime), so repeat calls within a process (multiple
+    routes sharing a timetable file, tests) skip the parse entirely.
+    """
+    cached = _extract_stops_cached(xml_file, os.path.getmtime(xml_file))
+    return {direction: list(stops) for direction, stops in cached}
 
-    # Define namespace
-    ns = {"txc": "http://www.transxchange.org.uk/"}
 
-    # Get all stop points first
-    stops_dict = {}
-    for stop_point in root.findall(".//txc:AnnotatedStopPointRef", ns):
-        stop_ref = stop_point.find("txc:StopPointRef", ns).text
-        common_name = stop_point.find("txc:CommonName", ns).text
-        stops_dict[stop_ref] = common_name
+@functools.lru_cache(maxsize=8)
+def _extract_stops_cached(xml_file, mtime):
+    """Parse xml_file and return direction stops as a hashable tuple.
 
-    print(f"Found {len(stops_dict)} total stops in XML")
+    Streams the XML with iterparse rather than building the whole tree, so
+    peak memory stays bounded regardless of timetable file size. A single
+    pass dispatches on element tag: StopPoints precede JourneyPatternSections
+    in TransXChange, so stops_dict is complete before any timing links arrive.
+    """
 
-    # Get stops for each direction from journey pattern sections
+    stops_dict = {}
     direction_stops = {"inbound": [], "outbound": []}
+    # ATCO codes already recorded per direction - set membership is O(1),
+    # unlike scanning the direction_stops lists for a matching dict
+    seen = {"inbound": set(), "outbound": set()}
+
+    # Destination strings repeat heavily across sections, so classify each
+    # distinct string once and look it up thereafter
+    _dir_cache = {}
+
+    # Default arguments bind the shared containers as locals (LOAD_FAST)
+    # instead of closure/global lookups on every call in the hot loop
+    def _handle(endpoint, _stops=stops_dict, _seen=seen, _dirs=direction_stops, _cache=_dir_cache):
+        """Classify a From/To endpoint by destination and record it once per direction."""
+        if endpoint is None:
+            return
+        dest_text = endpoint.findtext(DEST_TAG)
+        stop_id = endpoint.findtext(SPR_TAG)
+        if dest_text is None or stop_id is None:
+            return
+        stop_id = sys.intern(stop_id)
+        if stop_id not in _stops:
+            return
+
+        try:
+            direction = _cache[dest_text]
+        except KeyError:
+            # Determine direction based on destination
+            low = dest_text.lower()
+            if "london" in low or "victoria" in low:
+                direction = "outbound"
+            elif "oxford" in low:
+                direction = "inbound"
+            else:
+                direction = ""
+            _cache[dest_text] = direction
+
+        if direction and stop_id not in _seen[direction]:
+            _seen[direction].add(stop_id)
+            _dirs[direction].append(Stop(_stops[stop_id], stop_id))
+
+    # Local bindings for names resolved on every timing link
+    handle = _handle
+    from_tag = FROM_TAG
+    to_tag = TO_TAG
+
+    for elem in _iterparse_and_clear(xml_file, (ASPR_TAG, JP_SECTION_TAG)):
+        if elem.tag == ASPR_TAG:
+            # Interning collapses the many repeats of each code/name to a
+            # single string object, so later hashing and equality checks
+            # hit the pointer-identity fast path
+            stops_dict[sys.intern(elem.findtext(SPR_TAG))] = sys.intern(elem.findtext(CN_TAG))
+            continue
+
+        # JourneyPatternSection - %s formatting defers string construction
+        # until a handler actually fires, so this is near-free at the
+        # default WARNING level
+        logger.debug("Processing section: %s", elem.get("id"))
+
+        # Get all stops in sequence from this section - iter() yields the
+        # timing links lazily instead of materialising a list first
+        for timing_link in elem.iter(TL_TAG):
+            # Check From and To stops - direct children of the timing link
+            find = timing_link.find
+            handle(find(from_tag))
+            handle(find(to_tag))
+
+    logger.info("Found %d total stops in XML", len(stops_dict))
+
+    return tuple((direction, tuple(stops)) for direction, stops in direction_stops.items())
+
 
-    for jp_section in root.findall(".//txc:JourneyPatternSection", ns):
-        section_id = jp_section.get("id")
-        print(f"Processing section: {section_id}")
-
-        # Get all stops in sequence from this section
-        for timing_link in jp_section.findall(".//txc:JourneyPatternTimingLink", ns):
-            # Check From stop
-            from_elem = timing_link.find(".//txc:From", ns)
-            if from_elem is not None:
-                dest_display = from_elem.find("txc:DynamicDestinationDisplay", ns)
-                stop_ref_elem = from_elem.find("txc:StopPointRef", ns)
-
-                if dest_display is not None and stop_ref_elem is not None:
-                    dest_text = dest_display.text
-                    stop_id = stop_ref_elem.text
-
-                    if stop_id in stops_dict:
-                        stop_info = {"name": stops_dict[stop_id], "atco_code": stop_id}
-
-                        # Determine direction based on destination
-                        if "london" in dest_text.lower() or "victoria" in dest_text.lower():
-                            if stop_info not in direction_stops["outbound"]:
-                                direction_stops["outbound"].append(stop_info)
-                        elif "oxford" in dest_text.lower():
-                            if stop_info not in direction_stops["inbound"]:
-                                direction_stops["inbound"].append(stop_info)
-
-            # Check To stop
-            to_elem = timing_link.find(".//txc:To", ns)
-            if to_elem is not None:
-                dest_display = to_elem.find("txc:DynamicDestinationDisplay", ns)
-                stop_ref_elem = to_elem.find("txc:StopPointRef", ns)
-
-                if dest_display is not None and stop_ref_elem is not None:
-                    dest_text = dest_display.text
-                    stop_id = stop_ref_elem.text
-
-                    if stop_id in stops_dict:
-                        stop_info = {"name": stops_dict[stop_id], "atco_code": stop_id}
-
-                        # Determine direction based on destination
-                        if "london" in dest_text.lower() or "victoria" in dest_text.lower():
-                            if stop_info not in direction_stops["outbound"]:
-                                direction_stops["outbound"].append(stop_info)
-                        elif "oxford" in dest_text.lower():
-                            if stop_info not in direction_stops["inbound"]:
-                                direction_stops["inbound"].append(stop_info)
+class _StopExtractorTarget:
+    """Parser target that extracts direction stops without building Elements.
+
+    lxml feeds start/data/end events straight from libxml2; a small state
+    machine captures only the text we need (StopPointRef/CommonName pairs
+    and From/To destination displays), so no Element objects are allocated
+    at all.
+    """
+
+    _CAPTURED_TAGS = frozenset((SPR_TAG, CN_TAG, DEST_TAG))
+
+    def __init__(self):
+        self.stops_dict = {}
+        self.direction_stops = {"inbound": [], "outbound": []}
+        self._seen = {"inbound": set(), "outbound": set()}
+        self._dir_cache = {}
+        self._in_aspr = False
+        self._in_timing_link = False
+        self._in_endpoint = False
+        self._buf = None
+        self._text = {}
+
+    def start(self, tag, attrib):
+        if tag == ASPR_TAG:
+            self._in_aspr = True
+            self._text = {}
+        elif tag == TL_TAG:
+            self._in_timing_link = True
+        elif self._in_timing_link and tag in (FROM_TAG, TO_TAG):
+            self._in_endpoint = True
+            self._text = {}
+        elif (self._in_aspr or self._in_endpoint) and tag in self._CAPTURED_TAGS:
+            self._buf = []
+
+    def data(self, chunk):
+        if self._buf is not None:
+            self._buf.append(chunk)
+
+    def end(self, tag):
+        if self._buf is not None and tag in self._CAPTURED_TAGS:
+            self._text[tag] = "".join(self._buf)
+            self._buf = None
+        elif tag == ASPR_TAG:
+            self._in_aspr = False
+            stop_ref = self._text.get(SPR_TAG)
+            common_name = self._text.get(CN_TAG)
+            if stop_ref is not None:
+                self.stops_dict[sys.intern(stop_ref)] = (
+                    sys.intern(common_name) if common_name is not None else None
+                )
+        elif self._in_endpoint and tag in (FROM_TAG, TO_TAG):
+            self._in_endpoint = False
+            self._record(self._text.get(SPR_TAG), self._text.get(DEST_TAG))
+        elif tag == TL_TAG:
+            self._in_timing_link = False
+
+    def _record(self, stop_id, dest_text):
+        """Same classification logic as the iterparse extractor."""
+        if dest_text is None or stop_id is None:
+            return
+        stop_id = sys.intern(stop_id)
+        if stop_id not in self.stops_dict:
+            return
+
+        try:
+            direction = self._dir_cache[dest_text]
+        except KeyError:
+            low = dest_text.lower()
+            if "london" in low or "victoria" in low:
+                direction = "outbound"
+            elif "oxford" in low:
+                direction = "inbound"
+            else:
+                direction = ""
+            self._dir_cache[dest_text] = direction
+
+        if direction and stop_id not in self._seen[direction]:
+            self._seen[direction].add(stop_id)
+            self.direction_stops[direction].append(Stop(self.stops_dict[stop_id], stop_id))
+
+    def close(self):
+        return self.direction_stops
+
+
+def get_stops_via_target_parser(xml_file):
+    """Alternative to get_stops_from_journey_pattern_sections for minimal allocation.
+
+    Uses lxml's target parser interface, which produces only strings (no
+    transient Element objects) - worth it on very large timetables.
+    """
+    parser = etree.XMLParser(target=_StopExtractorTarget(), huge_tree=True)
+    return etree.parse(xml_file, parser)
+
+
+def load_or_extract_stops(xml_file, cache_path):
+    """Return direction stops for xml_file, using a JSON disk cache.
+
+    The cache records the source file's mtime and size so it is
+    invalidated automatically when the timetable is re-downloaded.
+    """
+    xml_stat = os.stat(xml_file)
+
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path) as f:
+                cached = json.load(f)
+            if (
+                cached.get("source_mtime") == xml_stat.st_mtime
+                and cached.get("source_size") == xml_stat.st_size
+            ):
+                print(f"Loaded stops from cache: {cache_path}")
+                return {
+                    direction: [Stop(**stop) for stop in stops]
+                    for direction, stops in cached["direction_stops"].items()
+                }
+        except (json.JSONDecodeError, KeyError, OSError):
+            pass  # Corrupt or stale cache - fall through and re-extract
+
+    direction_stops = get_stops_from_journey_pattern_sections(xml_file)
+
+    with open(cache_path, "w") as f:
+        json.dump(
+            {
+                "source_mtime": xml_stat.st_mtime,
+                "source_size": xml_stat.st_size,
+                "direction_stops": {
+                    direction: [stop._asdict() for stop in stops]
+                    for direction, stops in direction_stops.items()
+                },
+            },
+            f,
+        )
+    print(f"Cached stops to {cache_path}")
 
     return direction_stops
 
@@ -84,6 +293,8 @@ def get_stops_from_journey_pattern_sections(xml_file):
 def main():
     """Extract and display stops for all configured routes and directions."""
 
+    logging.basicConfig(level=logging.WARNING)
+
     for route_config in ROUTES_TO_ANALYZE:
         route_name = route_config["route_name"]
         xml_file = f"timetable-{route_name}.xml"
@@ -91,7 +302,7 @@ def main():
         print(f"\n=== Processing route: {route_name} ===")
 
         try:
-            direction_stops = get_stops_from_journey_pattern_sections(xml_file)
+            direction_stops = load_or_extract_stops(xml_file, f"stops-{route_name}.json")
 
             for direction in route_config["directions"]:
                 print(f"\n--- Direction: {direction} ---")
@@ -100,7 +311,7 @@ def main():
                 if stops:
                     print(f"Found {len(stops)} stops:")
                     for i, stop in enumerate(stops, 1):
-                        print(f"  {i:2d}. {stop['name']} ({stop['atco_code']})")
+                        print(f"  {i:2d}. {stop.name} ({stop.atco_code})")
                 else:
                     print("No stops found for this direction")
 
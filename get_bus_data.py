@@ -4,17 +4,122 @@ Main script to collect bus location data from BODS API and track arrivals at sto
 Runs for 3 hours, polling every 2 minutes.
 """
 
+import atexit
+import bisect
+import functools
+import gzip
+import json
+import math
 import os
+import pickle
 import sys
 import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from io import BytesIO
 from zoneinfo import ZoneInfo
 
 import gspread
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    from lxml import etree as ET
+
+    _PARSE_ERROR = ET.XMLSyntaxError
+except ImportError:
+    import xml.etree.ElementTree as ET
+
+    _PARSE_ERROR = ET.ParseError
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
 
 from config import GOOGLE_SHEET_ID, ROUTES_TO_ANALYZE
 
+# Dump raw SIRI responses to disk only when explicitly asked for - the
+# unconditional write was a blocking syscall on every poll per route
+DEBUG_DUMP_XML = os.getenv("DUMP_SIRI") == "1"
+
+# Shared timezone - resolved once instead of per timestamp
+_LONDON_TZ = ZoneInfo("Europe/London")
+
+# XML namespaces
+SIRI_NS = {"siri": "http://www.siri.org.uk/siri"}
+TXC_NS = {"txc": "http://www.transxchange.org.uk/"}
+
+# Clark-notation tag for the SIRI elements we stream
+_VA_TAG = "{http://www.siri.org.uk/siri}VehicleActivity"
+
+# Clark-notation tags for the TransXChange elements we stream
+_TXC = "{http://www.transxchange.org.uk/}"
+_ASPR_TAG = _TXC + "AnnotatedStopPointRef"
+_ROUTE_LINK_TAG = _TXC + "RouteLink"
+_JP_SECTION_TAG = _TXC + "JourneyPatternSection"
+_TIMETABLE_TAGS = (_ASPR_TAG, _ROUTE_LINK_TAG, _JP_SECTION_TAG)
+
+
+def _iter_timetable_elements(xml_file):
+    """Stream the timetable elements we need, freeing each once consumed.
+
+    With lxml the parser only materialises the matching tags and we delete
+    processed siblings, keeping peak memory bounded by the largest single
+    element instead of the whole file.
+    """
+    if hasattr(ET, "XPath"):  # lxml
+        context = ET.iterparse(xml_file, events=("end",), tag=_TIMETABLE_TAGS)
+    else:
+        context = ET.iterparse(xml_file, events=("end",))
+
+    for _event, elem in context:
+        if elem.tag not in _TIMETABLE_TAGS:
+            continue
+        yield elem
+        elem.clear()
+        if hasattr(elem, "getprevious"):
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+
+def _iter_vehicle_activities(content):
+    """Stream VehicleActivity elements from a SIRI response body.
+
+    Same tag-filtered iterparse idiom as the timetable parser: with lxml
+    only the matching elements are materialised and each is freed once
+    consumed, so large responses never hold the whole DOM.
+    """
+    if hasattr(ET, "XPath"):  # lxml
+        context = ET.iterparse(BytesIO(content), events=("end",), tag=_VA_TAG)
+    else:
+        context = ET.iterparse(BytesIO(content), events=("end",))
+
+    for _event, elem in context:
+        if elem.tag != _VA_TAG:
+            continue
+        yield elem
+        elem.clear()
+        if hasattr(elem, "getprevious"):
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+
+
+# Pooled HTTP session - keep-alive connections to the BODS API are reused
+# across the polling loop instead of a fresh TCP+TLS handshake per request
+_SESSION = requests.Session()
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=8,
+        max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504]),
+    ),
+)
+atexit.register(_SESSION.close)
+
 
 def load_bods_key():
     """Load BODS API key from file or environment variable."""
@@ -28,40 +133,52 @@ def load_bods_key():
         return key
 
 
+# Conditional-GET state per line: the feed often hasn't changed between
+# polls, and a 304 lets us skip the body transfer and the XML parse
+_etag_cache = {}
+_last_result = {}
+
+
 def get_bus_positions(api_key, line_ref):
     """Fetch current bus positions from BODS API."""
-    import xml.etree.ElementTree as ET
+    url = "https://data.bus-data.dft.gov.uk/api/v1/datafeed/"
 
-    url = f"https://data.bus-data.dft.gov.uk/api/v1/datafeed/?api_key={api_key}&lineRef={line_ref}"
+    headers = {}
+    if line_ref in _etag_cache:
+        headers["If-None-Match"] = _etag_cache[line_ref]
 
-    response = requests.get(url)
+    response = _SESSION.get(
+        url, params={"api_key": api_key, "lineRef": line_ref}, headers=headers, timeout=(5, 30)
+    )
+    if response.status_code == 304:
+        return _last_result[line_ref]
     response.raise_for_status()
 
-    print(f"Response status: {response.status_code}")
-    print(f"Response content type: {response.headers.get('content-type')}")
-
-    # Save response to disk for debugging
-    with open(f"api_response_{line_ref}.xml", "w") as f:
-        f.write(response.text)
-    print(f"Saved API response to api_response_{line_ref}.xml")
+    # Save response to disk for debugging (gzipped and timestamped so long
+    # runs don't balloon disk usage)
+    if DEBUG_DUMP_XML:
+        os.makedirs("dumps", exist_ok=True)
+        dump_path = f"dumps/{line_ref}_{int(time.time())}.xml.gz"
+        with gzip.open(dump_path, "wb") as f:
+            f.write(response.content)
+        print(f"Saved API response to {dump_path}")
 
-    if not response.text.strip():
+    if not response.content.strip():
         print("Empty response from API")
         return {"entity": []}
 
-    # Parse SIRI XML response
+    # Parse SIRI XML response - bytes avoid an extra decode step
     try:
-        root = ET.fromstring(response.text)
-        ns = {"siri": "http://www.siri.org.uk/siri"}
+        ns = SIRI_NS
 
         buses = []
-        for vehicle_activity in root.findall(".//siri:VehicleActivity", ns):
-            vehicle_ref = vehicle_activity.find(".//siri:VehicleRef", ns)
-            line_ref_elem = vehicle_activity.find(".//siri:LineRef", ns)
-            direction_ref = vehicle_activity.find(".//siri:DirectionRef", ns)
-            latitude = vehicle_activity.find(".//siri:Latitude", ns)
-            longitude = vehicle_activity.find(".//siri:Longitude", ns)
-            recorded_time = vehicle_activity.find("siri:RecordedAtTime", ns)
+        for vehicle_activity in _iter_vehicle_activities(response.content):
+            vehicle_ref = vehicle_activity.findtext(".//siri:VehicleRef", namespaces=ns)
+            line_ref_elem = vehicle_activity.findtext(".//siri:LineRef", namespaces=ns)
+            direction_ref = vehicle_activity.findtext(".//siri:DirectionRef", namespaces=ns)
+            latitude = vehicle_activity.findtext(".//siri:Latitude", namespaces=ns)
+            longitude = vehicle_activity.findtext(".//siri:Longitude", namespaces=ns)
+            recorded_time = vehicle_activity.findtext("siri:RecordedAtTime", namespaces=ns)
 
             if (
                 vehicle_ref is not None
@@ -71,27 +188,32 @@ def get_bus_positions(api_key, line_ref):
             ):
                 bus_data = {
                     "vehicle": {
-                        "vehicle": {"id": vehicle_ref.text},
+                        "vehicle": {"id": vehicle_ref},
                         "position": {
-                            "latitude": float(latitude.text),
-                            "longitude": float(longitude.text),
+                            "latitude": float(latitude),
+                            "longitude": float(longitude),
                         },
-                        "timestamp": recorded_time.text if recorded_time is not None else "",
+                        "timestamp": recorded_time if recorded_time is not None else "",
                         "trip": {
-                            "route_id": line_ref_elem.text,
+                            "route_id": line_ref_elem,
                             "trip_headsign": (
-                                direction_ref.text if direction_ref is not None else ""
+                                direction_ref if direction_ref is not None else ""
                             ),
-                            "trip_id": f"{line_ref_elem.text}_{vehicle_ref.text}",
+                            "trip_id": f"{line_ref_elem}_{vehicle_ref}",
                         },
                     }
                 }
                 buses.append(bus_data)
 
         print(f"Parsed {len(buses)} buses from SIRI XML")
-        return {"entity": buses}
-
-    except ET.ParseError as e:
+        result = {"entity": buses}
+        etag = response.headers.get("ETag")
+        if etag:
+            _etag_cache[line_ref] = etag
+            _last_result[line_ref] = result
+        return result
+
+    except _PARSE_ERROR as e:
         print(f"Error parsing XML: {e}")
         return {"entity": []}
 
@@ -151,26 +273,28 @@ def filter_target_routes(bus_data, target_routes):
     """Filter bus data for only the routes we want to analyze."""
     filtered_buses = []
 
+    # Set membership instead of scanning target_routes per bus
+    target_names = {target["route_name"] for target in target_routes}
+
     for bus in bus_data.get("entity", []):
         vehicle = bus.get("vehicle", {})
         trip = vehicle.get("trip", {})
 
         route_short_name = trip.get("route_id", "")
-        direction = trip.get("trip_headsign", "")
 
-        for target in target_routes:
-            if route_short_name == target["route_name"]:
-                filtered_buses.append(
-                    {
-                        "bus_id": vehicle.get("vehicle", {}).get("id", ""),
-                        "route": route_short_name,
-                        "direction": direction,
-                        "latitude": vehicle.get("position", {}).get("latitude"),
-                        "longitude": vehicle.get("position", {}).get("longitude"),
-                        "timestamp": vehicle.get("timestamp"),
-                        "trip_id": trip.get("trip_id", ""),
-                    }
-                )
+        if route_short_name in target_names:
+            position = vehicle.get("position", {})
+            filtered_buses.append(
+                {
+                    "bus_id": vehicle.get("vehicle", {}).get("id", ""),
+                    "route": route_short_name,
+                    "direction": trip.get("trip_headsign", ""),
+                    "latitude": position.get("latitude"),
+                    "longitude": position.get("longitude"),
+                    "timestamp": vehicle.get("timestamp"),
+                    "trip_id": trip.get("trip_id", ""),
+                }
+            )
 
     return filtered_buses
 
@@ -189,7 +313,6 @@ def setup_google_sheets():
         if not credentials_json:
             raise ValueError("Google service account credentials not found in file or GOOGLE_SERVICE_ACCOUNT_KEY environment variable")
 
-        import json
         credentials_dict = json.loads(credentials_json)
         gc = gspread.service_account_from_dict(credentials_dict)
 
@@ -226,117 +349,323 @@ def setup_google_sheets():
 # Global cache for stops data
 _stops_cache = {}
 
+# Arrival-detection state survives restarts in a small JSON file, so a
+# crash mid-session doesn't demote every bus back to "first observation"
+# and silently drop real arrivals
+_STATE_PATH = ".bus_state.json"
+# Discard persisted entries older than a session window - trip ids repeat
+# across days, and a stale "not_at_stop" would turn a later session's first
+# observation into a fabricated arrival
+_STATE_MAX_AGE_SEC = 3 * 3600
+
+# When each bus's state was last updated, persisted alongside the state so
+# stale entries can be aged out on load
+_bus_state_seen = {}
+
+
+def _load_bus_state():
+    """Load persisted bus arrival state from a previous run, if any."""
+    try:
+        with open(_STATE_PATH) as f:
+            raw = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    # Tuple keys are serialized as "bus_id|trip_id", values as [state, seen]
+    state = {}
+    cutoff = time.time() - _STATE_MAX_AGE_SEC
+    for key, value in raw.items():
+        if "|" not in key or not isinstance(value, list) or len(value) != 2:
+            continue
+        stop_state, seen = value
+        if seen < cutoff:
+            continue
+        bus_key = tuple(key.split("|", 1))
+        state[bus_key] = stop_state
+        _bus_state_seen[bus_key] = seen
+    return state
+
+
+def _save_bus_state():
+    """Atomically persist the bus arrival state to disk."""
+    now = time.time()
+    serializable = {
+        f"{bus_id}|{trip_id}": [value, _bus_state_seen.get((bus_id, trip_id), now)]
+        for (bus_id, trip_id), value in _bus_previous_state.items()
+    }
+    tmp_path = _STATE_PATH + ".tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump(serializable, f)
+        os.replace(tmp_path, _STATE_PATH)
+    except OSError as e:
+        print(f"Could not persist bus state: {e}")
+
+
 # Global state tracking for bus arrivals
-_bus_previous_state = {}
+_bus_previous_state = _load_bus_state()
+
+# Per-(route, direction) stop coordinate arrays for the vectorized
+# nearest-stop search, derived lazily from the stops lists
+_stop_arrays_cache = {}
+
+# Per-worksheet index of existing journey rows, hydrated from the sheet once
+# and then maintained in-process, so each poll no longer re-downloads the
+# whole tab with get_all_records()
+_journey_index = {}
+
+# Raw-data rows buffered across polls and flushed in one append_rows call
+# once the buffer is big or stale enough, instead of one Sheets request
+# per poll
+_raw_buffer = []
+_RAW_FLUSH_ROWS = 50
+_RAW_FLUSH_SEC = 600
+_raw_last_flush = time.monotonic()
+
+
+def reset_state():
+    """Clear all in-process caches and tracking state (used by the tests)."""
+    _bus_previous_state.clear()
+    _bus_state_seen.clear()
+    _stops_cache.clear()
+    _stop_arrays_cache.clear()
+    _journey_index.clear()
+    _raw_buffer.clear()
+    _etag_cache.clear()
+    _last_result.clear()
+    _nearest_stop_cached.cache_clear()
+
+
+def _flush_raw_rows(worksheet, force=False):
+    """Append buffered raw-data rows in a single request when due.
+
+    Returns True if rows were actually sent. The buffer is kept on
+    failure so rows are retried on the next flush.
+    """
+    global _raw_last_flush
+    if not _raw_buffer:
+        return False
+    due = (
+        force
+        or len(_raw_buffer) >= _RAW_FLUSH_ROWS
+        or time.monotonic() - _raw_last_flush >= _RAW_FLUSH_SEC
+    )
+    if not due:
+        return False
+    worksheet.append_rows(_raw_buffer, value_input_option="RAW")
+    _raw_buffer.clear()
+    _raw_last_flush = time.monotonic()
+    return True
+
+
+def _get_stop_arrays(route_name, direction, stops):
+    """Return radian lat/lon arrays (plus names and source indices) for the
+    stops that have coordinates, rebuilding if the stops list has changed."""
+    cache_key = (route_name, direction)
+    cached = _stop_arrays_cache.get(cache_key)
+    if cached is not None and cached["stops"] is stops:
+        return cached
+
+    indices = []
+    names = []
+    lats = []
+    lons = []
+    for i, stop in enumerate(stops):
+        if stop["lat"] is not None and stop["lon"] is not None:
+            indices.append(i)
+            names.append(stop["name"])
+            lats.append(stop["lat"])
+            lons.append(stop["lon"])
+
+    lat_rad = np.radians(np.asarray(lats, dtype=np.float64))
+    lon_rad = np.radians(np.asarray(lons, dtype=np.float64))
+    arrays = {
+        "stops": stops,
+        "indices": indices,
+        "names": names,
+        "lat_rad": lat_rad,
+        "lon_rad": lon_rad,
+        # Mean-latitude cosine for the equirectangular approximation
+        "cos_lat0": float(np.cos(lat_rad.mean())) if len(lat_rad) else 1.0,
+    }
+    # KD-tree over unit-sphere points for O(log N) nearest-stop queries;
+    # falls back to the vectorized scan when scipy is unavailable
+    if cKDTree is not None and len(lat_rad):
+        cos_lat = np.cos(lat_rad)
+        xyz = np.stack(
+            [cos_lat * np.cos(lon_rad), cos_lat * np.sin(lon_rad), np.sin(lat_rad)], axis=1
+        )
+        arrays["tree"] = cKDTree(xyz)
+    else:
+        arrays["tree"] = None
+    _stop_arrays_cache[cache_key] = arrays
+    return arrays
+
+
+def _nearest_stop_index(bus_lat, bus_lon, arrays):
+    """Return (index, distance_meters) of the nearest stop in arrays."""
+    if arrays["tree"] is not None:
+        lat = math.radians(bus_lat)
+        lon = math.radians(bus_lon)
+        cos_lat = math.cos(lat)
+        point = (cos_lat * math.cos(lon), cos_lat * math.sin(lon), math.sin(lat))
+        chord, idx = arrays["tree"].query(point, k=1)
+        # Chord length on the unit sphere back to great-circle meters
+        return int(idx), 2 * 6371000 * math.asin(min(chord / 2, 1.0))
+
+    # Bounding-box prefilter for the scipy-less scan: only stops within
+    # ~1 km in each axis get a distance computed. Any stop closer than the
+    # box size necessarily lies inside the box, so a sub-box-size winner is
+    # the true nearest; otherwise fall through to the full scan.
+    lat = math.radians(bus_lat)
+    lon = math.radians(bus_lon)
+    box = 1000.0 / 6371000.0  # ~1 km in radians
+    mask = (np.abs(arrays["lat_rad"] - lat) <= box) & (
+        np.abs((arrays["lon_rad"] - lon) * arrays["cos_lat0"]) <= box
+    )
+    if mask.any():
+        subset = np.nonzero(mask)[0]
+        x = (arrays["lon_rad"][subset] - lon) * arrays["cos_lat0"]
+        y = arrays["lat_rad"][subset] - lat
+        sq = x * x + y * y
+        j = int(np.argmin(sq))
+        if sq[j] < box * box:
+            return int(subset[j]), math.sqrt(sq[j]) * 6371000
+
+    sq_distances = _sq_distances_to_stops(bus_lat, bus_lon, arrays)
+    idx = int(np.argmin(sq_distances))
+    return idx, math.sqrt(sq_distances[idx]) * 6371000
+
+
+def _sq_distances_to_stops(bus_lat, bus_lon, arrays):
+    """Squared angular distances (radians^2) from one bus to every stop.
+
+    Uses the equirectangular approximation, which is accurate to well under
+    a meter over bus-route stop spacing at UK latitudes and needs only
+    multiplications. Convert a result to meters with sqrt(d2) * 6371000.
+    """
+    x = (arrays["lon_rad"] - math.radians(bus_lon)) * arrays["cos_lat0"]
+    y = arrays["lat_rad"] - math.radians(bus_lat)
+    return x * x + y * y
 
 
 def extract_stops_from_xml(route_name, direction):
     """Extract stops from downloaded TransXChange XML file for specific route/direction."""
-    import xml.etree.ElementTree as ET
-
-    # Check cache first
-    cache_key = f"{route_name}_{direction}"
+    # Check cache first - tuple keys avoid building a throwaway string per
+    # lookup and can't collide on embedded underscores
+    cache_key = (route_name, direction)
     if cache_key in _stops_cache:
         return _stops_cache[cache_key]
 
-    # Load the XML file
     xml_file = f"timetable-{route_name}.xml"
-    tree = ET.parse(xml_file)
-    root = tree.getroot()
 
-    # Define namespace
-    ns = {"txc": "http://www.transxchange.org.uk/"}
+    # On-disk cache keyed by the timetable's mtime+size, so a fresh process
+    # (e.g. a restart mid-session) warm-starts without re-parsing the XML.
+    # A re-downloaded timetable gets a new signature, orphaning stale files.
+    try:
+        sig = (os.path.getmtime(xml_file), os.path.getsize(xml_file))
+    except OSError:
+        sig = None
+    disk_cache_path = (
+        os.path.join(".stops_cache", f"{route_name}_{direction}_{sig[0]:.0f}_{sig[1]}.pkl")
+        if sig
+        else None
+    )
+    if disk_cache_path and os.path.exists(disk_cache_path):
+        try:
+            with open(disk_cache_path, "rb") as f:
+                direction_stops = pickle.load(f)
+            _stops_cache[cache_key] = direction_stops
+            print(f"Loaded {len(direction_stops)} stops for {route_name} {direction} from disk cache")
+            return direction_stops
+        except Exception as e:
+            print(f"Ignoring unreadable stops cache {disk_cache_path}: {e}")
+
+    # Stream the XML in a single pass. StopPoints and RouteSections precede
+    # JourneyPatternSections in TransXChange, so stops_dict (with
+    # coordinates) is complete before any timing links are processed.
+    ns = TXC_NS
 
-    # Get all stop points with their names
     stops_dict = {}
-    for stop_point in root.findall(".//txc:AnnotatedStopPointRef", ns):
-        stop_ref = stop_point.find("txc:StopPointRef", ns).text
-        common_name = stop_point.find("txc:CommonName", ns).text
-        stops_dict[stop_ref] = {"name": common_name, "lat": None, "lon": None}
-
-    # Get coordinates from RouteLinks - map stops to their approximate locations
-    stop_coordinates = {}
-    for route_link in root.findall(".//txc:RouteLink", ns):
-        from_stop = route_link.find(".//txc:From/txc:StopPointRef", ns)
-        to_stop = route_link.find(".//txc:To/txc:StopPointRef", ns)
-
-        # Get first coordinate from the track mapping for this route link
-        first_location = route_link.find(".//txc:Track/txc:Mapping/txc:Location[1]", ns)
-        if first_location is not None:
-            longitude = first_location.find("txc:Longitude", ns)
-            latitude = first_location.find("txc:Latitude", ns)
-
-            if longitude is not None and latitude is not None:
-                coord = (float(latitude.text), float(longitude.text))
-
-                # Assign this coordinate to the from_stop
-                if from_stop is not None:
-                    stop_id = from_stop.text
-                    if stop_id not in stop_coordinates:
-                        stop_coordinates[stop_id] = coord
-
-        # Get last coordinate for the to_stop
-        last_location = route_link.find(".//txc:Track/txc:Mapping/txc:Location[last()]", ns)
-        if last_location is not None:
-            longitude = last_location.find("txc:Longitude", ns)
-            latitude = last_location.find("txc:Latitude", ns)
-
-            if longitude is not None and latitude is not None:
-                coord = (float(latitude.text), float(longitude.text))
-
-                # Assign this coordinate to the to_stop
-                if to_stop is not None:
-                    stop_id = to_stop.text
-                    if stop_id not in stop_coordinates:
-                        stop_coordinates[stop_id] = coord
-
-    # Update stops_dict with coordinates
-    for stop_id, coord in stop_coordinates.items():
-        if stop_id in stops_dict:
-            stops_dict[stop_id]["lat"] = coord[0]
-            stops_dict[stop_id]["lon"] = coord[1]
-
-    # Get stops for the requested direction
     direction_stops = []
-
-    for jp_section in root.findall(".//txc:JourneyPatternSection", ns):
-        for timing_link in jp_section.findall(".//txc:JourneyPatternTimingLink", ns):
-            # Check From and To stops
-            for stop_elem in [
-                timing_link.find(".//txc:From", ns),
-                timing_link.find(".//txc:To", ns),
+    seen_stop_ids = set()  # O(1) dedup on atco_code instead of scanning the list
+
+    for elem in _iter_timetable_elements(xml_file):
+        if elem.tag == _ASPR_TAG:
+            stop_ref = elem.find("txc:StopPointRef", ns).text
+            common_name = elem.find("txc:CommonName", ns).text
+            stops_dict[stop_ref] = {"name": common_name, "lat": None, "lon": None}
+
+        elif elem.tag == _ROUTE_LINK_TAG:
+            # Get coordinates from the RouteLink - map its stops to their
+            # approximate locations (first assignment wins)
+            from_stop = elem.find("txc:From/txc:StopPointRef", ns)
+            to_stop = elem.find("txc:To/txc:StopPointRef", ns)
+
+            # First coordinate of the track mapping goes to the from_stop,
+            # the last one to the to_stop. Direct-child paths - the schema
+            # is fixed, so there is no need to walk the whole subtree
+            locations = elem.findall("txc:Track/txc:Mapping/txc:Location", ns)
+            for stop_elem, location in [
+                (from_stop, locations[0] if locations else None),
+                (to_stop, locations[-1] if locations else None),
             ]:
-                if stop_elem is not None:
-                    dest_display = stop_elem.find("txc:DynamicDestinationDisplay", ns)
-                    stop_ref_elem = stop_elem.find("txc:StopPointRef", ns)
-
-                    if dest_display is not None and stop_ref_elem is not None:
-                        dest_text = dest_display.text
-                        stop_id = stop_ref_elem.text
-
-                        if stop_id in stops_dict:
-                            stop_data = stops_dict[stop_id]
-                            stop_info = {
-                                "name": stop_data["name"],
-                                "atco_code": stop_id,
-                                "lat": stop_data["lat"],
-                                "lon": stop_data["lon"],
-                            }
-
-                            # Determine if this stop matches our direction
-                            direction_match = False
-                            if direction == "inbound" and ("oxford" in dest_text.lower()):
-                                direction_match = True
-                            elif direction == "outbound" and (
-                                "london" in dest_text.lower() or "victoria" in dest_text.lower()
-                            ):
-                                direction_match = True
-
-                            if direction_match and stop_info not in direction_stops:
-                                direction_stops.append(stop_info)
+                if stop_elem is None or location is None:
+                    continue
+                longitude = location.find("txc:Longitude", ns)
+                latitude = location.find("txc:Latitude", ns)
+                if longitude is None or latitude is None:
+                    continue
+
+                stop_data = stops_dict.get(stop_elem.text)
+                if stop_data is not None and stop_data["lat"] is None:
+                    stop_data["lat"] = float(latitude.text)
+                    stop_data["lon"] = float(longitude.text)
+
+        elif elem.tag == _JP_SECTION_TAG:
+            # Get stops for the requested direction
+            for timing_link in elem.findall("txc:JourneyPatternTimingLink", ns):
+                # Check From and To stops
+                for stop_elem in [
+                    timing_link.find("txc:From", ns),
+                    timing_link.find("txc:To", ns),
+                ]:
+                    if stop_elem is not None:
+                        dest_display = stop_elem.find("txc:DynamicDestinationDisplay", ns)
+                        stop_ref_elem = stop_elem.find("txc:StopPointRef", ns)
+
+                        if dest_display is not None and stop_ref_elem is not None:
+                            dest_text = dest_display.text
+                            stop_id = stop_ref_elem.text
+
+                            if stop_id in stops_dict and stop_id not in seen_stop_ids:
+                                # Determine if this stop matches our direction
+                                direction_match = False
+                                if direction == "inbound" and ("oxford" in dest_text.lower()):
+                                    direction_match = True
+                                elif direction == "outbound" and (
+                                    "london" in dest_text.lower()
+                                    or "victoria" in dest_text.lower()
+                                ):
+                                    direction_match = True
+
+                                if direction_match:
+                                    stop_data = stops_dict[stop_id]
+                                    seen_stop_ids.add(stop_id)
+                                    direction_stops.append(
+                                        {
+                                            "name": stop_data["name"],
+                                            "atco_code": stop_id,
+                                            "lat": stop_data["lat"],
+                                            "lon": stop_data["lon"],
+                                        }
+                                    )
 
     # Cache the result
     _stops_cache[cache_key] = direction_stops
+    if disk_cache_path:
+        os.makedirs(".stops_cache", exist_ok=True)
+        with open(disk_cache_path, "wb") as f:
+            pickle.dump(direction_stops, f, protocol=pickle.HIGHEST_PROTOCOL)
     print(f"Cached {len(direction_stops)} stops for {route_name} {direction} with coordinates")
 
     return direction_stops
@@ -361,8 +690,6 @@ def create_route_tab_with_stops(sheet, route_config, stops):
 
 def calculate_distance(lat1, lon1, lat2, lon2):
     """Calculate distance between two points in meters using Haversine formula."""
-    import math
-
     # Convert to radians
     lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
 
@@ -377,6 +704,23 @@ def calculate_distance(lat1, lon1, lat2, lon2):
     return c * r
 
 
+@functools.lru_cache(maxsize=4096)
+def _nearest_stop_cached(route_name, direction, lat_q, lon_q):
+    """Memoized nearest-stop search keyed by coordinates rounded to ~1 m.
+
+    Printing, arrival detection and the raw-data sheet all look up the same
+    bus positions on the same tick, so memoizing here runs the spatial query
+    once per bus per poll. Returns (index into the stops list, distance in
+    meters), or (None, inf) when no stop has coordinates.
+    """
+    stops = extract_stops_from_xml(route_name, direction)
+    arrays = _get_stop_arrays(route_name, direction, stops)
+    if not arrays["names"]:
+        return None, float("inf")
+    idx, distance = _nearest_stop_index(lat_q, lon_q, arrays)
+    return arrays["indices"][idx], distance
+
+
 def find_nearest_stop(bus_lat, bus_lon, route_name, direction):
     """Find the nearest stop to a bus and return stop name and distance."""
     stops = extract_stops_from_xml(route_name, direction)
@@ -384,24 +728,37 @@ def find_nearest_stop(bus_lat, bus_lon, route_name, direction):
     if not stops:
         return "No stops found", float("inf")
 
-    # Find the nearest stop with coordinates
-    nearest_stop = None
-    nearest_distance = float("inf")
-
-    for stop in stops:
-        if stop["lat"] is not None and stop["lon"] is not None:
-            # Calculate distance using Haversine formula
-            distance = calculate_distance(bus_lat, bus_lon, stop["lat"], stop["lon"])
-            if distance < nearest_distance:
-                nearest_distance = distance
-                nearest_stop = stop["name"]
+    idx, distance = _nearest_stop_cached(
+        route_name, direction, round(bus_lat, 5), round(bus_lon, 5)
+    )
+    if idx is not None:
+        return stops[idx]["name"], distance
 
     # If no stops with coordinates found, return first stop
-    if nearest_stop is None:
-        nearest_stop = stops[0]["name"] if stops else "Unknown"
-        nearest_distance = 0  # Unknown distance
+    return stops[0]["name"], 0  # Unknown distance
+
 
-    return nearest_stop, nearest_distance
+def _bus_location_line(bus, nearest_stop, distance):
+    """Format the console line for one bus's current location."""
+    return (
+        f"Bus {bus['bus_id']}: {bus['latitude']:.6f}, {bus['longitude']:.6f} | "
+        f"{bus['direction']} | Nearest: {nearest_stop} ({distance:.0f}m)"
+    )
+
+
+def _raw_data_row(bus, timestamp, nearest_stop, distance):
+    """Build one raw-data sheet row for a bus position."""
+    return [
+        timestamp,
+        bus["bus_id"],
+        bus["route"],
+        bus["direction"],
+        bus["latitude"],
+        bus["longitude"],
+        bus["trip_id"],
+        nearest_stop,
+        round(distance) if distance != float("inf") else "",
+    ]
 
 
 def print_bus_locations(filtered_buses):
@@ -413,172 +770,239 @@ def print_bus_locations(filtered_buses):
         bus for bus in filtered_buses if bus["latitude"] == 0 and bus["longitude"] == 0
     ]
 
-    print(
+    # Assemble all the output first so it goes out in one write rather
+    # than one syscall per bus
+    lines = [
         f"\n=== Current Bus Locations ({len(valid_buses)} valid, {len(invalid_buses)} invalid) ==="
-    )
+    ]
 
     for bus in valid_buses:
-        bus_id = bus["bus_id"]
-        route = bus["route"]
-        direction = bus["direction"]
-        lat = bus["latitude"]
-        lon = bus["longitude"]
-
-        # Find nearest stop
-        nearest_stop, distance = find_nearest_stop(lat, lon, route, direction)
-
-        print(
-            f"Bus {bus_id}: {lat:.6f}, {lon:.6f} | {direction} | Nearest: {nearest_stop} ({distance:.0f}m)"
+        nearest_stop, distance = find_nearest_stop(
+            bus["latitude"], bus["longitude"], bus["route"], bus["direction"]
         )
+        lines.append(_bus_location_line(bus, nearest_stop, distance))
 
     # Report invalid buses separately
     if invalid_buses:
-        print(f"\nSkipped {len(invalid_buses)} buses with invalid GPS coordinates:")
+        lines.append(f"\nSkipped {len(invalid_buses)} buses with invalid GPS coordinates:")
         for bus in invalid_buses:
-            print(f"  Bus {bus['bus_id']}: (0,0) - Invalid GPS data")
-
+            lines.append(f"  Bus {bus['bus_id']}: (0,0) - Invalid GPS data")
+
+    print("\n".join(lines))
+
+
+def _detect_arrival_for_bus(bus, arrival_threshold_meters, now_iso=None, stops=None):
+    """Update arrival state for one bus and return an arrival dict, or None.
+
+    The caller is expected to have already screened out invalid (0,0)
+    coordinates, and can pass now_iso so one timestamp covers the whole
+    tick instead of being regenerated per arrival, plus the route's stops
+    so they are resolved once per group rather than once per bus.
+    """
+    if now_iso is None:
+        now_iso = datetime.now(_LONDON_TZ).isoformat()
+    bus_id = bus["bus_id"]
+    route = bus["route"]
+    direction = bus["direction"]
+    lat = bus["latitude"]
+    lon = bus["longitude"]
+    trip_id = bus["trip_id"]
+
+    # Get all stops for this route/direction
+    if stops is None:
+        stops = extract_stops_from_xml(route, direction)
 
-def update_raw_data_sheet(worksheet, bus_data):
-    """Update raw data sheet with current bus positions."""
-    timestamp = datetime.now(ZoneInfo("Europe/London")).isoformat()
+    # Find which stop (if any) this bus is currently at - the nearest
+    # stop overall, provided it is within the threshold distance
+    current_stop_at = None
+    current_distance = float("inf")
+
+    idx, distance = _nearest_stop_cached(route, direction, round(lat, 5), round(lon, 5))
+    if idx is not None and distance <= arrival_threshold_meters:
+        current_stop_at = stops[idx]
+        current_distance = distance
+
+    # Check previous state for this bus (bound locally - this runs per bus
+    # per poll)
+    state = _bus_previous_state
+    bus_key = (bus_id, trip_id)
+    previous_stop = state.get(bus_key, None)
+    arrival = None
+
+    # If bus is now at a stop but wasn't at this stop before, it's an arrival
+    if current_stop_at is not None:
+        current_stop_name = current_stop_at["name"]
+
+        # This is an arrival ONLY if:
+        # 1. Bus was previously not at any stop, OR
+        # 2. Bus was at a different stop before
+        # (NOT if previous_stop is None - that means first observation, we don't know if it's an arrival)
+        if previous_stop == "not_at_stop" or (
+            previous_stop is not None and previous_stop != current_stop_name
+        ):
+            print(
+                f"ARRIVAL DETECTED: Bus {bus_id} arrived at {current_stop_name} (was: {previous_stop})"
+            )
 
-    rows_to_add = []
-    for bus in bus_data:
-        # Find nearest stop and distance
-        nearest_stop, distance = find_nearest_stop(
-            bus["latitude"], bus["longitude"], bus["route"], bus["direction"]
-        )
+            arrival = {
+                "timestamp": now_iso,
+                "date": now_iso[:10],
+                "time": now_iso[11:19],
+                "bus_id": bus_id,
+                "trip_id": trip_id,
+                "route": route,
+                "direction": direction,
+                "stop_name": current_stop_at["name"],
+                "stop_code": current_stop_at["atco_code"],
+                "distance_meters": round(current_distance),
+                "bus_lat": lat,
+                "bus_lon": lon,
+                "stop_lat": current_stop_at["lat"],
+                "stop_lon": current_stop_at["lon"],
+            }
+        elif previous_stop is None:
+            print(
+                f"FIRST OBSERVATION: Bus {bus_id} observed at {current_stop_name} (not counting as arrival)"
+            )
 
-        rows_to_add.append(
-            [
-                timestamp,
-                bus["bus_id"],
-                bus["route"],
-                bus["direction"],
-                bus["latitude"],
-                bus["longitude"],
-                bus["trip_id"],
-                nearest_stop,
-                round(distance) if distance != float("inf") else "",
-            ]
-        )
+        # Update state - bus is now at this stop
+        state[bus_key] = current_stop_name
+    else:
+        # Bus is not at any stop
+        if previous_stop is None:
+            print(f"FIRST OBSERVATION: Bus {bus_id} not at any stop")
+        state[bus_key] = "not_at_stop"
 
-    if rows_to_add:
-        worksheet.append_rows(rows_to_add)
+    _bus_state_seen[bus_key] = time.time()
+    return arrival
 
 
 def detect_stop_arrivals(filtered_buses, arrival_threshold_meters=100):
     """Detect when buses actually arrive at stops (transition from not at stop to at stop)."""
-    global _bus_previous_state
+    now_iso = datetime.now(_LONDON_TZ).isoformat()
     arrivals = []
+    stops_by_route = {}
 
     for bus in filtered_buses:
-        bus_id = bus["bus_id"]
-        route = bus["route"]
-        direction = bus["direction"]
-        lat = bus["latitude"]
-        lon = bus["longitude"]
-        trip_id = bus["trip_id"]
-
         # Skip buses with invalid coordinates
-        if lat == 0 and lon == 0:
-            print(f"Skipping bus {bus_id} with invalid coordinates (0,0)")
+        if bus["latitude"] == 0 and bus["longitude"] == 0:
+            print(f"Skipping bus {bus['bus_id']} with invalid coordinates (0,0)")
             continue
 
-        # Get all stops for this route/direction
-        stops = extract_stops_from_xml(route, direction)
-
-        # Find which stop (if any) this bus is currently at
-        current_stop_at = None
-        current_distance = float("inf")
-
-        for stop in stops:
-            if stop["lat"] is not None and stop["lon"] is not None:
-                distance = calculate_distance(lat, lon, stop["lat"], stop["lon"])
-
-                # If bus is within threshold distance, it's "at" this stop
-                if distance <= arrival_threshold_meters:
-                    if distance < current_distance:
-                        current_stop_at = stop
-                        current_distance = distance
-
-        # Check previous state for this bus
-        bus_key = f"{bus_id}_{trip_id}"
-        previous_stop = _bus_previous_state.get(bus_key, None)
-
-        # If bus is now at a stop but wasn't at this stop before, it's an arrival
-        if current_stop_at is not None:
-            current_stop_name = current_stop_at["name"]
-
-            # This is an arrival ONLY if:
-            # 1. Bus was previously not at any stop, OR
-            # 2. Bus was at a different stop before
-            # (NOT if previous_stop is None - that means first observation, we don't know if it's an arrival)
-            if previous_stop == "not_at_stop" or (
-                previous_stop is not None and previous_stop != current_stop_name
-            ):
-                print(
-                    f"ARRIVAL DETECTED: Bus {bus_id} arrived at {current_stop_name} (was: {previous_stop})"
-                )
+        # Resolve each route/direction's stop list once per tick
+        key = (bus["route"], bus["direction"])
+        stops = stops_by_route.get(key)
+        if stops is None:
+            stops = stops_by_route[key] = extract_stops_from_xml(*key)
 
-                arrivals.append(
-                    {
-                        "timestamp": datetime.now(ZoneInfo("Europe/London")).isoformat(),
-                        "bus_id": bus_id,
-                        "trip_id": trip_id,
-                        "route": route,
-                        "direction": direction,
-                        "stop_name": current_stop_at["name"],
-                        "stop_code": current_stop_at["atco_code"],
-                        "distance_meters": round(current_distance),
-                        "bus_lat": lat,
-                        "bus_lon": lon,
-                        "stop_lat": current_stop_at["lat"],
-                        "stop_lon": current_stop_at["lon"],
-                    }
-                )
-            elif previous_stop is None:
-                print(
-                    f"FIRST OBSERVATION: Bus {bus_id} observed at {current_stop_name} (not counting as arrival)"
-                )
+        arrival = _detect_arrival_for_bus(bus, arrival_threshold_meters, now_iso, stops)
+        if arrival is not None:
+            arrivals.append(arrival)
 
-            # Update state - bus is now at this stop
-            _bus_previous_state[bus_key] = current_stop_name
-        else:
-            # Bus is not at any stop
-            if previous_stop is None:
-                print(f"FIRST OBSERVATION: Bus {bus_id} not at any stop")
-            _bus_previous_state[bus_key] = "not_at_stop"
+    if filtered_buses:
+        _save_bus_state()
 
     return arrivals
 
 
-def update_route_specific_sheet(worksheet, arrivals, stops):
-    """Update route-specific sheet with bus arrival times at stops."""
-    if not arrivals:
-        return
+def process_tick(filtered_buses, arrival_threshold_meters=100):
+    """Process one poll's buses in a single fused pass.
 
-    from collections import defaultdict
-    from datetime import datetime, timedelta
+    Returns (location_lines, raw_rows, arrivals). One traversal with one
+    nearest-stop lookup per bus produces the console output, the raw-data
+    sheet rows and the detected arrivals, instead of three separate loops
+    over the same list.
+    """
+    timestamp = datetime.now(_LONDON_TZ).isoformat()
+    valid_lines = []
+    invalid_lines = []
+    raw_rows = []
+    arrivals = []
+    stops_by_route = {}
 
-    # Group arrivals by date and bus, but track journey times
-    arrivals_by_date_bus = defaultdict(lambda: defaultdict(dict))
+    for bus in filtered_buses:
+        nearest_stop, distance = find_nearest_stop(
+            bus["latitude"], bus["longitude"], bus["route"], bus["direction"]
+        )
+        raw_rows.append(_raw_data_row(bus, timestamp, nearest_stop, distance))
 
-    for arrival in arrivals:
-        date = arrival["timestamp"][:10]  # Extract date part
-        bus_id = arrival["bus_id"]
-        stop_name = arrival["stop_name"]
-        time = arrival["timestamp"][11:19]  # Extract time part
+        if bus["latitude"] == 0 and bus["longitude"] == 0:
+            invalid_lines.append(f"  Bus {bus['bus_id']}: (0,0) - Invalid GPS data")
+            continue
 
-        # Store the arrival time for this bus at this stop
-        arrivals_by_date_bus[date][bus_id][stop_name] = time
+        valid_lines.append(_bus_location_line(bus, nearest_stop, distance))
 
-    # Get current sheet data to find existing rows to update or determine journey separation
+        # Resolve each route/direction's stop list once per tick
+        key = (bus["route"], bus["direction"])
+        stops = stops_by_route.get(key)
+        if stops is None:
+            stops = stops_by_route[key] = extract_stops_from_xml(*key)
+
+        arrival = _detect_arrival_for_bus(bus, arrival_threshold_meters, timestamp, stops)
+        if arrival is not None:
+            arrivals.append(arrival)
+
+    lines = [
+        f"\n=== Current Bus Locations ({len(valid_lines)} valid, {len(invalid_lines)} invalid) ==="
+    ]
+    lines.extend(valid_lines)
+    if invalid_lines:
+        lines.append(f"\nSkipped {len(invalid_lines)} buses with invalid GPS coordinates:")
+        lines.extend(invalid_lines)
+
+    if filtered_buses:
+        _save_bus_state()
+
+    return lines, raw_rows, arrivals
+
+
+def _time_to_seconds(time_str):
+    """Parse an HH:MM:SS string to seconds since midnight.
+
+    Plain slicing and int() - datetime.strptime is far too slow for a
+    helper called per journey comparison, and raises the same ValueError
+    on malformed input.
+    """
+    return int(time_str[0:2]) * 3600 + int(time_str[3:5]) * 60 + int(time_str[6:8])
+
+
+def _add_journey(journeys, key, seconds, row_index):
+    """Record a journey for (date, bus_id), keeping its times sorted."""
+    entry = journeys.setdefault(key, {"times_sec": [], "rows": []})
+    pos = bisect.bisect_left(entry["times_sec"], seconds)
+    entry["times_sec"].insert(pos, seconds)
+    entry["rows"].insert(pos, row_index)
+
+
+def _find_same_journey_row(entry, new_sec):
+    """Return the row index of an existing journey within 3 hours of new_sec.
+
+    The times list is sorted, so only the bisect neighbours (plus the ends,
+    for the midnight wrap) need the 3-hour test instead of every journey.
+    """
+    times = entry["times_sec"]
+    i = bisect.bisect_left(times, new_sec)
+    last = len(times) - 1
+    for j in {max(i - 1, 0), min(i, last), 0, last}:
+        if 0 <= j <= last:
+            diff = abs(times[j] - new_sec)
+            # diff > 75600 (21h) is the same 3-hour window wrapped past midnight
+            if diff < 10800 or diff > 75600:
+                return entry["rows"][j]
+    return None
+
+
+def _get_journey_index(worksheet, stops):
+    """Return the cached journey index for a worksheet, hydrating it from the
+    sheet with a single get_all_records() call on first use."""
+    index = _journey_index.get(worksheet.id)
+    if index is not None:
+        return index
+
+    journeys = {}  # {(date, bus_id): [{"earliest_time", "row_index"}, ...]}
+    num_rows = 0
     try:
         existing_data = worksheet.get_all_records()
-        existing_rows = {}  # {(date, bus_id, journey_group): row_index}
-        bus_journey_times = {}  # {(date, bus_id): [list of earliest times from existing rows]}
-        
         for i, row in enumerate(existing_data):
             date = row.get("Date", "")
             bus_id = row.get("Bus_ID", "")
@@ -590,49 +1014,64 @@ def update_route_specific_sheet(worksheet, arrivals, stops):
                     if stop_time:
                         earliest_time = stop_time
                         break
-                
+
                 if earliest_time:
-                    if (date, bus_id) not in bus_journey_times:
-                        bus_journey_times[(date, bus_id)] = []
-                    bus_journey_times[(date, bus_id)].append({
-                        "earliest_time": earliest_time,
-                        "row_index": i + 2  # +2 because sheets are 1-indexed and have header
-                    })
-    except Exception:
-        existing_rows = {}
-        bus_journey_times = {}
-
-    def is_same_journey(new_time, existing_time):
-        """Check if two times are within 3 hours (same journey)."""
-        try:
-            new_dt = datetime.strptime(new_time, "%H:%M:%S")
-            existing_dt = datetime.strptime(existing_time, "%H:%M:%S")
-            
-            # Handle day boundary crossings
-            if abs((new_dt - existing_dt).total_seconds()) > 12 * 3600:  # More than 12 hours apart
-                # One is likely from previous/next day, adjust
-                if new_dt.hour < 12 and existing_dt.hour > 12:
-                    new_dt += timedelta(days=1)
-                elif existing_dt.hour < 12 and new_dt.hour > 12:
-                    existing_dt += timedelta(days=1)
-            
-            time_diff = abs((new_dt - existing_dt).total_seconds())
-            return time_diff < 3 * 3600  # Less than 3 hours = same journey
-        except ValueError:
-            return False
+                    try:
+                        seconds = _time_to_seconds(earliest_time)
+                    except ValueError:
+                        continue
+                    # +2 because sheets are 1-indexed and have a header row
+                    _add_journey(journeys, (date, bus_id), seconds, i + 2)
+        num_rows = len(existing_data)
+    except Exception as e:
+        # Don't cache a failed read - an empty index would stick and its
+        # row numbers would overwrite unrelated journeys. Return a
+        # throwaway index (append-only behaviour) and retry the
+        # hydration on the next call.
+        print(f"Could not read existing journey rows: {e}")
+        return {"journeys": {}, "num_rows": 0}
+
+    index = {"journeys": journeys, "num_rows": num_rows}
+    _journey_index[worksheet.id] = index
+    return index
+
+
+def update_route_specific_sheet(worksheet, arrivals, stops):
+    """Update route-specific sheet with bus arrival times at stops."""
+    if not arrivals:
+        return
+
+    # Group arrivals by date and bus, but track journey times
+    arrivals_by_date_bus = defaultdict(lambda: defaultdict(dict))
+
+    for arrival in arrivals:
+        # Prefer the pre-split fields from detection; fall back to slicing
+        # the ISO timestamp for arrivals built elsewhere
+        date = arrival.get("date") or arrival["timestamp"][:10]
+        bus_id = arrival["bus_id"]
+        stop_name = arrival["stop_name"]
+        time = arrival.get("time") or arrival["timestamp"][11:19]
+
+        # Store the arrival time for this bus at this stop
+        arrivals_by_date_bus[date][bus_id][stop_name] = time
+
+    # Cached index of existing journey rows (hydrated from the sheet on
+    # first use, then maintained in-process as we append/update rows)
+    index = _get_journey_index(worksheet, stops)
+    bus_journey_times = index["journeys"]
 
     stop_names = [stop["name"] for stop in stops]
+    # Column D is the first stop (A=Date, B=Bus_ID, C=Trip_ID, D=first stop)
+    stop_columns = {name: i + 4 for i, name in enumerate(stop_names)}
+    # bus_id -> trip_id once, instead of re-scanning arrivals per bus
+    trip_id_by_bus = {arrival["bus_id"]: arrival["trip_id"] for arrival in arrivals}
     rows_to_add = []
+    new_journeys = []  # [((date, bus_id), earliest_time)] parallel to rows_to_add
     rows_to_update = []
 
     for date, buses in arrivals_by_date_bus.items():
         for bus_id, stop_arrivals in buses.items():
-            # Find a trip_id from any arrival for this bus
-            trip_id = ""
-            for arrival in arrivals:
-                if arrival["bus_id"] == bus_id:
-                    trip_id = arrival["trip_id"]
-                    break
+            trip_id = trip_id_by_bus.get(bus_id, "")
 
             # Find the earliest time in the new arrivals
             new_earliest_time = None
@@ -644,26 +1083,30 @@ def update_route_specific_sheet(worksheet, arrivals, stops):
             if not new_earliest_time:
                 continue  # No arrival times for this bus
 
+            try:
+                new_sec = _time_to_seconds(new_earliest_time)
+            except ValueError:
+                continue
+
             # Check if this should update an existing row or create a new one
             update_row_index = None
-            if (date, bus_id) in bus_journey_times:
-                for journey_info in bus_journey_times[(date, bus_id)]:
-                    if is_same_journey(new_earliest_time, journey_info["earliest_time"]):
-                        update_row_index = journey_info["row_index"]
-                        break
+            entry = bus_journey_times.get((date, bus_id))
+            if entry:
+                update_row_index = _find_same_journey_row(entry, new_sec)
 
             if update_row_index:
                 # Update existing row with new arrival times
                 updates = []
-                for col_index, stop_name in enumerate(stop_names):
-                    if stop_name in stop_arrivals:
-                        # Column D is first stop (A=Date, B=Bus_ID, C=Trip_ID, D=first stop)
-                        cell_address = f"{chr(68 + col_index)}{update_row_index}"
-                        updates.append({"range": cell_address, "values": [[stop_arrivals[stop_name]]]})
+                for stop_name, arrival_time in stop_arrivals.items():
+                    column = stop_columns.get(stop_name)
+                    if column is not None:
+                        # rowcol_to_a1 handles columns past Z, unlike chr() math
+                        cell_address = gspread.utils.rowcol_to_a1(update_row_index, column)
+                        updates.append({"range": cell_address, "values": [[arrival_time]]})
 
                 if updates:
                     rows_to_update.extend(updates)
-                    print(f"Updating existing journey for bus {bus_id} (same journey as {journey_info['earliest_time']})")
+                    print(f"Updating existing journey for bus {bus_id} (row {update_row_index})")
             else:
                 # Create new row - this is a separate journey
                 row = [date, bus_id, trip_id]
@@ -672,17 +1115,25 @@ def update_route_specific_sheet(worksheet, arrivals, stops):
                     arrival_time = stop_arrivals.get(stop_name, "")
                     row.append(arrival_time)
                 rows_to_add.append(row)
+                new_journeys.append(((date, bus_id), new_sec))
                 print(f"Creating new journey row for bus {bus_id} starting at {new_earliest_time}")
 
-    # Add new rows to sheet
+    # Add new rows to sheet and record them in the in-process index so the
+    # next poll matches against them without re-reading the sheet
     if rows_to_add:
         worksheet.append_rows(rows_to_add)
+        for key, seconds in new_journeys:
+            index["num_rows"] += 1
+            _add_journey(bus_journey_times, key, seconds, index["num_rows"] + 1)
         print(f"Added {len(rows_to_add)} new bus journey records to route sheet")
 
-    # Update existing rows with new arrival times
+    # Update existing rows with new arrival times - one batched request
+    # instead of one HTTP round-trip per cell
     if rows_to_update:
-        for update in rows_to_update:
-            worksheet.update(update["range"], update["values"])
+        # RAW matches the append_rows path - USER_ENTERED would coerce the
+        # HH:MM:SS strings into time-typed cells that read back
+        # locale-formatted and break journey re-hydration
+        worksheet.batch_update(rows_to_update, value_input_option="RAW")
         print(f"Updated {len(rows_to_update)} stop arrivals in existing journey rows")
 
 
@@ -707,22 +1158,38 @@ def initialize_tracking_session(target_routes):
                 direction_config = {"route_name": route_name, "direction": direction}
                 route_tab = create_route_tab_with_stops(sheet, direction_config, stops)
                 worksheets[f"{route_name}_{direction}"] = route_tab
+                # Hydrate the journey index up front so polls start warm
+                _get_journey_index(route_tab, stops)
 
     return api_key, worksheets
 
 
 def collect_bus_data(api_key, target_routes):
-    """Collect bus position data from BODS API for all target routes."""
+    """Collect bus position data from BODS API for all target routes.
+
+    Routes are fetched concurrently, so total latency is roughly the
+    slowest single request rather than the sum of all round-trips.
+    """
+    if not target_routes:
+        return []
+
     all_buses = []
-    for route_config in target_routes:
-        route_name = route_config["route_name"]
-        try:
-            bus_data = get_bus_positions(api_key, route_name)
-            all_buses.extend(bus_data.get("entity", []))
-        except Exception as e:
-            print(f"BODS API error for route {route_name}: {e}")
-            continue
-    
+    with ThreadPoolExecutor(max_workers=min(len(target_routes), 8)) as executor:
+        futures = [
+            (
+                route_config["route_name"],
+                executor.submit(get_bus_positions, api_key, route_config["route_name"]),
+            )
+            for route_config in target_routes
+        ]
+        for route_name, future in futures:
+            try:
+                bus_data = future.result()
+                all_buses.extend(bus_data.get("entity", []))
+            except Exception as e:
+                print(f"BODS API error for route {route_name}: {e}")
+                continue
+
     return all_buses
 
 
@@ -731,11 +1198,11 @@ def process_bus_data(filtered_buses, worksheets):
     if not filtered_buses:
         return []
 
-    # Print bus locations
-    print_bus_locations(filtered_buses)
+    # One fused pass produces the console output, raw-data rows and
+    # arrivals together
+    lines, raw_rows, arrivals = process_tick(filtered_buses, arrival_threshold_meters=100)
+    print("\n".join(lines))
 
-    # Detect stop arrivals
-    arrivals = detect_stop_arrivals(filtered_buses, arrival_threshold_meters=100)
     if arrivals:
         print(f"Detected {len(arrivals)} stop arrivals:")
         for arrival in arrivals:
@@ -743,10 +1210,11 @@ def process_bus_data(filtered_buses, worksheets):
                 f"  Bus {arrival['bus_id']} at {arrival['stop_name']} ({arrival['distance_meters']}m)"
             )
 
-    # Update raw data sheet
+    # Buffer raw rows; the flush batches several polls into one request
     try:
-        update_raw_data_sheet(worksheets["raw_data"], filtered_buses)
-        print("Updated raw data sheet")
+        _raw_buffer.extend(raw_rows)
+        if _flush_raw_rows(worksheets["raw_data"]):
+            print("Updated raw data sheet")
     except Exception as e:
         print(f"Google Sheets error: {e}")
 
@@ -763,35 +1231,69 @@ def update_route_specific_sheets(arrivals, worksheets):
         # Group arrivals by route and direction
         arrivals_by_route_direction = {}
         for arrival in arrivals:
-            key = f"{arrival['route']}_{arrival['direction']}"
+            key = (arrival["route"], arrival["direction"])
             if key not in arrivals_by_route_direction:
                 arrivals_by_route_direction[key] = []
             arrivals_by_route_direction[key].append(arrival)
 
-        # Update each route-specific sheet
-        for key, route_arrivals in arrivals_by_route_direction.items():
-            if key in worksheets:
-                route_name, direction = key.split("_", 1)
+        # Update each route-specific sheet (worksheets stay keyed by tab
+        # title, built from the tuple rather than split back out of it)
+        for (route_name, direction), route_arrivals in arrivals_by_route_direction.items():
+            ws_key = f"{route_name}_{direction}"
+            if ws_key in worksheets:
                 stops = extract_stops_from_xml(route_name, direction)
                 update_route_specific_sheet(
-                    worksheets[key], route_arrivals, stops
+                    worksheets[ws_key], route_arrivals, stops
                 )
 
     except Exception as e:
         print(f"Route-specific sheets error: {e}")
 
 
+# Adaptive polling bounds: poll sooner when a bus could plausibly reach a
+# stop before the next tick, back off when everything is far away
+_MIN_POLL_SEC = 30
+_MAX_POLL_SEC = 120
+_ASSUMED_SPEED_MPS = 8.0  # ~30 km/h average coach speed
+
+
+def _next_poll_interval(filtered_buses):
+    """Choose the next sleep from each bus's time-to-nearest-stop estimate.
+
+    The nearest-stop distances were already computed (and memoized) during
+    processing, so this costs only cache lookups.
+    """
+    min_eta = None
+    for bus in filtered_buses:
+        if bus["latitude"] == 0 and bus["longitude"] == 0:
+            continue
+        _idx, distance = _nearest_stop_cached(
+            bus["route"], bus["direction"], round(bus["latitude"], 5), round(bus["longitude"], 5)
+        )
+        if distance == float("inf"):
+            continue
+        eta = distance / _ASSUMED_SPEED_MPS
+        if min_eta is None or eta < min_eta:
+            min_eta = eta
+
+    if min_eta is None:
+        return _MAX_POLL_SEC
+    return max(_MIN_POLL_SEC, min(int(min_eta * 0.5), _MAX_POLL_SEC))
+
+
 def run_tracking_loop(api_key, worksheets, target_routes, duration_hours=3):
     """Run the main tracking loop for the specified duration."""
-    start_time = datetime.now(ZoneInfo("Europe/London"))
+    start_time = datetime.now(_LONDON_TZ)
     end_time = start_time + timedelta(hours=duration_hours)
     poll_count = 0
+    consecutive_failures = 0
 
     print(f"Starting tracking loop until {end_time}")
 
-    while datetime.now(ZoneInfo("Europe/London")) < end_time:
+    while datetime.now(_LONDON_TZ) < end_time:
         poll_count += 1
-        current_time = datetime.now(ZoneInfo("Europe/London"))
+        current_time = datetime.now(_LONDON_TZ)
+        poll_started = time.monotonic()
 
         print(f"Poll #{poll_count} at {current_time}")
 
@@ -806,19 +1308,36 @@ def run_tracking_loop(api_key, worksheets, target_routes, duration_hours=3):
             # Process the data and update sheets
             process_bus_data(filtered_buses, worksheets)
 
+            consecutive_failures = 0
+            interval = _next_poll_interval(filtered_buses)
+
         except Exception as e:
+            # Exponential backoff on repeated failures, capped at the
+            # normal maximum interval
+            consecutive_failures += 1
+            interval = min(_MAX_POLL_SEC, 15 * 2**consecutive_failures)
             print(f"General error in poll #{poll_count}: {e}")
 
-        # Sleep for 1 minute before next poll
         print("...")
-        time.sleep(60)
+        # Sleep to the next deadline rather than for the full interval, so
+        # fetch/processing time doesn't stretch the effective poll period
+        sleep_for = interval - (time.monotonic() - poll_started)
+        if sleep_for > 0:
+            time.sleep(sleep_for)
+
+    # Push out any rows still buffered when the session ends
+    if "raw_data" in worksheets:
+        try:
+            _flush_raw_rows(worksheets["raw_data"], force=True)
+        except Exception as e:
+            print(f"Google Sheets error on final flush: {e}")
 
     return poll_count
 
 
 def main():
     """Main execution function - runs for 3 hours."""
-    start_time = datetime.now(ZoneInfo("Europe/London"))
+    start_time = datetime.now(_LONDON_TZ)
     
     print(f"Starting bus tracking at {start_time}")
 
@@ -829,7 +1348,7 @@ def main():
         # Run the main tracking loop
         poll_count = run_tracking_loop(api_key, worksheets, ROUTES_TO_ANALYZE, duration_hours=3)
 
-        print(f"Completed {poll_count} polls. Tracking session ended at {datetime.now(ZoneInfo('Europe/London'))}")
+        print(f"Completed {poll_count} polls. Tracking session ended at {datetime.now(_LONDON_TZ)}")
 
     except Exception as e:
         print(f"Fatal error: {e}")
@@ -12,16 +12,17 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 
 @pytest.fixture(autouse=True)
-def clear_state():
+def clear_state(monkeypatch, tmp_path):
     """Clear global state before each test."""
-    # Clear the bus state tracking
-    from get_bus_data import _bus_previous_state, _stops_cache
+    import get_bus_data
 
-    _bus_previous_state.clear()
-    _stops_cache.clear()
+    # Keep persisted state out of the repo root - detect_stop_arrivals
+    # writes .bus_state.json, which a real run would load at import
+    monkeypatch.setattr(get_bus_data, "_STATE_PATH", str(tmp_path / "bus_state.json"))
+    get_bus_data.reset_state()
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_bus_data():
     """Sample bus data for testing."""
     return {
@@ -54,7 +55,7 @@ def sample_bus_data():
     }
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_stops():
     """Sample stop data for testing."""
     return [
@@ -73,7 +74,7 @@ def sample_stops():
     ]
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_config():
     """Sample configuration for testing."""
     return [
@@ -2,22 +2,29 @@
 Test arrival detection logic and state tracking.
 """
 
+import pytest
+
 from get_bus_data import _bus_previous_state, detect_stop_arrivals
 
+# Stop sets served by the shared _mock_stops fixture below
+DEFAULT_STOPS = [{"name": "Test Stop", "lat": 51.5074, "lon": -0.1278, "atco_code": "TEST123"}]
+TWO_STOPS = [
+    {"name": "Stop A", "lat": 51.5074, "lon": -0.1278, "atco_code": "A123"},
+    {"name": "Stop B", "lat": 51.5084, "lon": -0.1278, "atco_code": "B456"},
+]
+
 
 class TestArrivalDetection:
     """Test arrival detection and state tracking."""
 
-    def setup_method(self):
-        """Clear state before each test."""
-        _bus_previous_state.clear()
+    @pytest.fixture(autouse=True)
+    def _mock_stops(self, mocker, request):
+        """Patch extract_stops_from_xml once per test instead of per method."""
+        stops = getattr(request, "param", DEFAULT_STOPS)
+        mocker.patch("get_bus_data.extract_stops_from_xml", return_value=stops)
 
-    def test_detect_arrivals_first_observation(self, mocker):
+    def test_detect_arrivals_first_observation(self):
         """First observations should not count as arrivals."""
-        # Mock extract_stops_from_xml to return test stops
-        mock_stops = [{"name": "Test Stop", "lat": 51.5074, "lon": -0.1278, "atco_code": "TEST123"}]
-        mocker.patch("get_bus_data.extract_stops_from_xml", return_value=mock_stops)
-
         # Bus very close to stop (first observation)
         buses = [
             {
@@ -34,15 +41,12 @@ class TestArrivalDetection:
 
         # Should be no arrivals on first observation
         assert len(arrivals) == 0
-        assert _bus_previous_state["BUS001_TRIP001"] == "Test Stop"
+        assert _bus_previous_state[("BUS001", "TRIP001")] == "Test Stop"
 
-    def test_detect_arrivals_transition_to_stop(self, mocker):
+    def test_detect_arrivals_transition_to_stop(self):
         """Bus moving from not at stop to at stop should be an arrival."""
-        mock_stops = [{"name": "Test Stop", "lat": 51.5074, "lon": -0.1278, "atco_code": "TEST123"}]
-        mocker.patch("get_bus_data.extract_stops_from_xml", return_value=mock_stops)
-
         # Set previous state: bus was not at any stop
-        _bus_previous_state["BUS001_TRIP001"] = "not_at_stop"
+        _bus_previous_state[("BUS001", "TRIP001")] = "not_at_stop"
 
         # Bus now at stop
         buses = [
@@ -64,13 +68,10 @@ class TestArrivalDetection:
         assert arrivals[0]["stop_name"] == "Test Stop"
         assert arrivals[0]["distance_meters"] < 10
 
-    def test_detect_arrivals_already_at_stop(self, mocker):
+    def test_detect_arrivals_already_at_stop(self):
         """Bus already at stop should not trigger new arrival."""
-        mock_stops = [{"name": "Test Stop", "lat": 51.5074, "lon": -0.1278, "atco_code": "TEST123"}]
-        mocker.patch("get_bus_data.extract_stops_from_xml", return_value=mock_stops)
-
         # Set previous state: bus was already at this stop
-        _bus_previous_state["BUS001_TRIP001"] = "Test Stop"
+        _bus_previous_state[("BUS001", "TRIP001")] = "Test Stop"
 
         # Bus still at same stop
         buses = [
@@ -89,16 +90,11 @@ class TestArrivalDetection:
         # Should be no new arrivals
         assert len(arrivals) == 0
 
-    def test_detect_arrivals_stop_to_stop(self, mocker):
+    @pytest.mark.parametrize("_mock_stops", [TWO_STOPS], indirect=True)
+    def test_detect_arrivals_stop_to_stop(self):
         """Bus moving from one stop to another should be an arrival."""
-        mock_stops = [
-            {"name": "Stop A", "lat": 51.5074, "lon": -0.1278, "atco_code": "A123"},
-            {"name": "Stop B", "lat": 51.5084, "lon": -0.1278, "atco_code": "B456"},
-        ]
-        mocker.patch("get_bus_data.extract_stops_from_xml", return_value=mock_stops)
-
         # Set previous state: bus was at Stop A
-        _bus_previous_state["BUS001_TRIP001"] = "Stop A"
+        _bus_previous_state[("BUS001", "TRIP001")] = "Stop A"
 
         # Bus now at Stop B
         buses = [
@@ -118,11 +114,8 @@ class TestArrivalDetection:
         assert len(arrivals) == 1
         assert arrivals[0]["stop_name"] == "Stop B"
 
-    def test_detect_arrivals_invalid_coordinates(self, mocker):
+    def test_detect_arrivals_invalid_coordinates(self):
         """Buses with invalid coordinates should be skipped."""
-        mock_stops = [{"name": "Test Stop", "lat": 51.5074, "lon": -0.1278, "atco_code": "TEST123"}]
-        mocker.patch("get_bus_data.extract_stops_from_xml", return_value=mock_stops)
-
         # Bus with invalid coordinates
         buses = [
             {
@@ -139,15 +132,12 @@ class TestArrivalDetection:
 
         # Should be no arrivals (bus skipped)
         assert len(arrivals) == 0
-        assert "BUS001_TRIP001" not in _bus_previous_state
+        assert ("BUS001", "TRIP001") not in _bus_previous_state
 
-    def test_detect_arrivals_threshold_distance(self, mocker):
+    def test_detect_arrivals_threshold_distance(self):
         """Bus outside threshold should not trigger arrival."""
-        mock_stops = [{"name": "Test Stop", "lat": 51.5074, "lon": -0.1278, "atco_code": "TEST123"}]
-        mocker.patch("get_bus_data.extract_stops_from_xml", return_value=mock_stops)
-
         # Set previous state: bus was not at stop
-        _bus_previous_state["BUS001_TRIP001"] = "not_at_stop"
+        _bus_previous_state[("BUS001", "TRIP001")] = "not_at_stop"
 
         # Bus far from stop (more than 1km away)
         buses = [
@@ -165,4 +155,4 @@ class TestArrivalDetection:
 
         # Should be no arrivals (too far)
         assert len(arrivals) == 0
-        assert _bus_previous_state["BUS001_TRIP001"] == "not_at_stop"
+        assert _bus_previous_state[("BUS001", "TRIP001")] == "not_at_stop"
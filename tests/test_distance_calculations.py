@@ -2,39 +2,29 @@
 Test distance calculations and coordinate handling.
 """
 
+import pytest
+
 from get_bus_data import calculate_distance, find_nearest_stop
 
 
 class TestDistanceCalculations:
     """Test distance calculation functions."""
 
-    def test_calculate_distance_same_point(self):
-        """Distance between same point should be 0."""
-        lat, lon = 51.5074, -0.1278  # London coordinates
-        distance = calculate_distance(lat, lon, lat, lon)
-        assert distance == 0.0
-
-    def test_calculate_distance_known_points(self):
-        """Test distance between known points."""
-        # London to Paris (approximately 344 km)
-        london_lat, london_lon = 51.5074, -0.1278
-        paris_lat, paris_lon = 48.8566, 2.3522
-
-        distance = calculate_distance(london_lat, london_lon, paris_lat, paris_lon)
-
-        # Should be approximately 344,000 meters (allow 10km tolerance)
-        assert 334000 < distance < 354000
-
-    def test_calculate_distance_small_distance(self):
-        """Test distance calculation for small distances."""
-        # Two points very close together (about 111m apart)
-        lat1, lon1 = 51.5074, -0.1278
-        lat2, lon2 = 51.5084, -0.1278  # 0.001 degree difference in latitude
-
+    @pytest.mark.parametrize(
+        "lat1,lon1,lat2,lon2,low,high",
+        [
+            # Same point (London) - distance should be 0
+            (51.5074, -0.1278, 51.5074, -0.1278, 0, 1e-9),
+            # London to Paris - approximately 344 km (allow 10km tolerance)
+            (51.5074, -0.1278, 48.8566, 2.3522, 334000, 354000),
+            # 0.001 degree of latitude - approximately 111 m (allow 10m tolerance)
+            (51.5074, -0.1278, 51.5084, -0.1278, 100, 122),
+        ],
+    )
+    def test_calculate_distance(self, lat1, lon1, lat2, lon2, low, high):
+        """Test distance calculation against known point pairs."""
         distance = calculate_distance(lat1, lon1, lat2, lon2)
-
-        # Should be approximately 111 meters (allow 10m tolerance)
-        assert 100 < distance < 122
+        assert low <= distance <= high
 
     def test_find_nearest_stop_with_mock_data(self, mocker):
         """Test finding nearest stop with mocked stop data."""
@@ -3,20 +3,39 @@ Test journey separation logic for handling multiple bus journeys per day.
 """
 
 import pytest
-from datetime import datetime, timedelta
-from unittest.mock import MagicMock
 
 from get_bus_data import update_route_specific_sheet
 
 
+class FakeWorksheet:
+    """Minimal worksheet stand-in recording writes as plain lists.
+
+    MagicMock's auto-created attributes and call history add measurable
+    overhead per test; these assertions only need the recorded rows.
+    """
+
+    def __init__(self, records):
+        self.id = id(self)
+        self._records = records
+        self.updates = []
+        self.appends = []
+
+    def get_all_records(self):
+        return self._records
+
+    def batch_update(self, updates, **kwargs):
+        self.updates.extend(updates)
+
+    def append_rows(self, rows, **kwargs):
+        self.appends.extend(rows)
+
+
 class TestJourneySeparation:
     """Test cases for journey separation logic."""
-    
+
     def test_same_journey_updates_existing_row(self):
         """Test that arrivals within 3 hours update the existing row."""
-        worksheet = MagicMock()
-        
-        # Mock existing data - bus has journey starting at 08:00
+        # Existing data - bus has journey starting at 08:00
         existing_data = [
             {
                 "Date": "2025-07-03",
@@ -27,14 +46,14 @@ class TestJourneySeparation:
                 "Stop C": ""
             }
         ]
-        worksheet.get_all_records.return_value = existing_data
-        
+        worksheet = FakeWorksheet(existing_data)
+
         stops = [
             {"name": "Stop A"},
             {"name": "Stop B"},
             {"name": "Stop C"}
         ]
-        
+
         # New arrival within 3 hours (same journey)
         arrivals = [
             {
@@ -48,16 +67,14 @@ class TestJourneySeparation:
         ]
         
         update_route_specific_sheet(worksheet, arrivals, stops)
-        
+
         # Should update existing row, not create new one
-        worksheet.update.assert_called()
-        worksheet.append_rows.assert_not_called()
-    
+        assert worksheet.updates
+        assert not worksheet.appends
+
     def test_different_journey_creates_new_row(self):
         """Test that arrivals after 3+ hours create a new row."""
-        worksheet = MagicMock()
-        
-        # Mock existing data - bus has journey starting at 08:00
+        # Existing data - bus has journey starting at 08:00
         existing_data = [
             {
                 "Date": "2025-07-03",
@@ -68,14 +85,14 @@ class TestJourneySeparation:
                 "Stop C": ""
             }
         ]
-        worksheet.get_all_records.return_value = existing_data
-        
+        worksheet = FakeWorksheet(existing_data)
+
         stops = [
             {"name": "Stop A"},
             {"name": "Stop B"},
             {"name": "Stop C"}
         ]
-        
+
         # New arrival after 3+ hours (different journey)
         arrivals = [
             {
@@ -89,29 +106,26 @@ class TestJourneySeparation:
         ]
         
         update_route_specific_sheet(worksheet, arrivals, stops)
-        
+
         # Should create new row, not update existing
-        worksheet.append_rows.assert_called()
+        assert worksheet.appends
     
     def test_journey_time_comparison_logic(self):
         """Test the journey time comparison logic."""
         
         def is_same_journey(new_time, existing_time):
-            """Check if two times are within 3 hours (same journey)."""
+            """Check if two times are within 3 hours (same journey).
+
+            Integer-seconds arithmetic, matching _time_to_seconds in the
+            source - strptime is far too slow for a per-comparison helper.
+            The min() against the complement handles the midnight wrap.
+            """
             try:
-                new_dt = datetime.strptime(new_time, "%H:%M:%S")
-                existing_dt = datetime.strptime(existing_time, "%H:%M:%S")
-                
-                # Handle day boundary crossings
-                if abs((new_dt - existing_dt).total_seconds()) > 12 * 3600:  # More than 12 hours apart
-                    # One is likely from previous/next day, adjust
-                    if new_dt.hour < 12 and existing_dt.hour > 12:
-                        new_dt += timedelta(days=1)
-                    elif existing_dt.hour < 12 and new_dt.hour > 12:
-                        existing_dt += timedelta(days=1)
-                
-                time_diff = abs((new_dt - existing_dt).total_seconds())
-                return time_diff < 3 * 3600  # Less than 3 hours = same journey
+                def hms(s):
+                    return int(s[0:2]) * 3600 + int(s[3:5]) * 60 + int(s[6:8])
+
+                diff = abs(hms(new_time) - hms(existing_time))
+                return min(diff, 86400 - diff) < 3 * 3600
             except ValueError:
                 return False
         
@@ -129,9 +143,7 @@ class TestJourneySeparation:
     
     def test_multiple_journeys_same_day(self):
         """Test handling multiple journeys for the same bus on the same day."""
-        worksheet = MagicMock()
-        
-        # Mock existing data with two journeys for same bus
+        # Existing data with two journeys for same bus
         existing_data = [
             {
                 "Date": "2025-07-03",
@@ -150,14 +162,14 @@ class TestJourneySeparation:
                 "Stop C": ""
             }
         ]
-        worksheet.get_all_records.return_value = existing_data
-        
+        worksheet = FakeWorksheet(existing_data)
+
         stops = [
             {"name": "Stop A"},
             {"name": "Stop B"},
             {"name": "Stop C"}
         ]
-        
+
         # New arrival that matches the afternoon journey
         arrivals = [
             {
@@ -171,16 +183,15 @@ class TestJourneySeparation:
         ]
         
         update_route_specific_sheet(worksheet, arrivals, stops)
-        
+
         # Should update the afternoon journey row
-        worksheet.update.assert_called()
-        worksheet.append_rows.assert_not_called()
-    
+        assert worksheet.updates
+        assert not worksheet.appends
+
     def test_no_existing_data(self):
         """Test behavior when no existing data exists."""
-        worksheet = MagicMock()
-        worksheet.get_all_records.return_value = []
-        
+        worksheet = FakeWorksheet([])
+
         stops = [{"name": "Stop A"}]
         
         arrivals = [
@@ -195,7 +206,7 @@ class TestJourneySeparation:
         ]
         
         update_route_specific_sheet(worksheet, arrivals, stops)
-        
+
         # Should create new row since no existing data
-        worksheet.append_rows.assert_called()
-        worksheet.update.assert_not_called()
\ No newline at end of file
+        assert worksheet.appends
+        assert not worksheet.updates
\ No newline at end of file
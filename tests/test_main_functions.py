@@ -20,64 +20,68 @@ class TestCollectBusData:
     @patch('get_bus_data.get_bus_positions')
     def test_collect_bus_data_success(self, mock_get_positions):
         """Test successful bus data collection."""
-        # Mock successful API responses
-        mock_get_positions.side_effect = [
-            {"entity": [{"bus": "123"}]},
-            {"entity": [{"bus": "456"}, {"bus": "789"}]}
-        ]
-        
+        # Routes are fetched concurrently, so key responses by route
+        # rather than relying on call order
+        responses = {
+            "ROUTE1": {"entity": [{"bus": "123"}]},
+            "ROUTE2": {"entity": [{"bus": "456"}, {"bus": "789"}]}
+        }
+        mock_get_positions.side_effect = lambda api_key, line_ref: responses[line_ref]
+
         target_routes = [
             {"route_name": "ROUTE1"},
             {"route_name": "ROUTE2"}
         ]
-        
+
         result = collect_bus_data("test_api_key", target_routes)
-        
-        # Should combine all buses from all routes
+
+        # Should combine all buses from all routes, in route order
         assert len(result) == 3
         assert result == [{"bus": "123"}, {"bus": "456"}, {"bus": "789"}]
-        
+
         # Should call API for each route
         mock_get_positions.assert_has_calls([
             call("test_api_key", "ROUTE1"),
             call("test_api_key", "ROUTE2")
-        ])
-    
+        ], any_order=True)
+
     @patch('get_bus_data.get_bus_positions')
     def test_collect_bus_data_with_api_errors(self, mock_get_positions):
         """Test bus data collection with some API errors."""
         # Mock one successful and one failed API call
-        mock_get_positions.side_effect = [
-            {"entity": [{"bus": "123"}]},
-            Exception("API Error")
-        ]
-        
+        def fake_get_positions(api_key, line_ref):
+            if line_ref == "ROUTE2":
+                raise Exception("API Error")
+            return {"entity": [{"bus": "123"}]}
+        mock_get_positions.side_effect = fake_get_positions
+
         target_routes = [
             {"route_name": "ROUTE1"},
             {"route_name": "ROUTE2"}
         ]
-        
+
         result = collect_bus_data("test_api_key", target_routes)
-        
+
         # Should return data from successful calls only
         assert len(result) == 1
         assert result == [{"bus": "123"}]
-    
+
     @patch('get_bus_data.get_bus_positions')
     def test_collect_bus_data_empty_responses(self, mock_get_positions):
         """Test handling of empty API responses."""
-        mock_get_positions.side_effect = [
-            {"entity": []},
-            {}  # Missing entity key
-        ]
-        
+        responses = {
+            "ROUTE1": {"entity": []},
+            "ROUTE2": {}  # Missing entity key
+        }
+        mock_get_positions.side_effect = lambda api_key, line_ref: responses[line_ref]
+
         target_routes = [
             {"route_name": "ROUTE1"},
             {"route_name": "ROUTE2"}
         ]
-        
+
         result = collect_bus_data("test_api_key", target_routes)
-        
+
         # Should handle empty responses gracefully
         assert result == []
 
@@ -86,67 +90,70 @@ class TestProcessBusData:
     """Test the process_bus_data function."""
     
     @patch('get_bus_data.update_route_specific_sheets')
-    @patch('get_bus_data.update_raw_data_sheet')
-    @patch('get_bus_data.detect_stop_arrivals')
-    @patch('get_bus_data.print_bus_locations')
-    def test_process_bus_data_with_arrivals(self, mock_print, mock_detect, mock_update_raw, mock_update_routes):
+    @patch('get_bus_data.process_tick')
+    def test_process_bus_data_with_arrivals(self, mock_tick, mock_update_routes):
         """Test processing bus data with arrivals detected."""
         filtered_buses = [{"bus_id": "123", "lat": 51.5, "lon": -0.1}]
         mock_arrivals = [{"bus_id": "123", "stop_name": "Test Stop", "distance_meters": 50}]
-        mock_detect.return_value = mock_arrivals
-        
+        raw_rows = [["2025-01-01T12:00:00", "123"]]
+        mock_tick.return_value = (["Bus 123 line"], raw_rows, mock_arrivals)
+
         worksheets = {"raw_data": MagicMock()}
-        
+
         result = process_bus_data(filtered_buses, worksheets)
-        
-        # Should call all processing functions
-        mock_print.assert_called_once_with(filtered_buses)
-        mock_detect.assert_called_once_with(filtered_buses, arrival_threshold_meters=100)
-        mock_update_raw.assert_called_once_with(worksheets["raw_data"], filtered_buses)
+
+        # Should run the fused pass once and dispatch its outputs
+        mock_tick.assert_called_once_with(filtered_buses, arrival_threshold_meters=100)
+        # Raw rows are buffered for a batched flush rather than written per poll
+        import get_bus_data
+        assert get_bus_data._raw_buffer == raw_rows
         mock_update_routes.assert_called_once_with(mock_arrivals, worksheets)
-        
+
         assert result == mock_arrivals
-    
+
     @patch('get_bus_data.update_route_specific_sheets')
-    @patch('get_bus_data.update_raw_data_sheet')
-    @patch('get_bus_data.detect_stop_arrivals')
-    @patch('get_bus_data.print_bus_locations')
-    def test_process_bus_data_no_arrivals(self, mock_print, mock_detect, mock_update_raw, mock_update_routes):
+    @patch('get_bus_data.process_tick')
+    def test_process_bus_data_no_arrivals(self, mock_tick, mock_update_routes):
         """Test processing bus data with no arrivals."""
         filtered_buses = [{"bus_id": "123", "lat": 51.5, "lon": -0.1}]
-        mock_detect.return_value = []
-        
+        raw_rows = [["2025-01-01T12:00:00", "123"]]
+        mock_tick.return_value = (["Bus 123 line"], raw_rows, [])
+
         worksheets = {"raw_data": MagicMock()}
-        
+
         result = process_bus_data(filtered_buses, worksheets)
-        
+
         # Should not call route-specific updates when no arrivals
-        mock_print.assert_called_once()
-        mock_detect.assert_called_once()
-        mock_update_raw.assert_called_once()
+        mock_tick.assert_called_once()
+        import get_bus_data
+        assert get_bus_data._raw_buffer == raw_rows
         mock_update_routes.assert_not_called()
-        
+
         assert result == []
-    
+
     def test_process_bus_data_empty_input(self):
         """Test processing with no bus data."""
         result = process_bus_data([], {})
         assert result == []
-    
-    @patch('get_bus_data.update_raw_data_sheet')
-    @patch('get_bus_data.detect_stop_arrivals')
-    @patch('get_bus_data.print_bus_locations')
-    def test_process_bus_data_sheet_error(self, mock_print, mock_detect, mock_update_raw):
+
+    @patch('get_bus_data.process_tick')
+    def test_process_bus_data_sheet_error(self, mock_tick):
         """Test handling of Google Sheets errors."""
+        import get_bus_data
+
         filtered_buses = [{"bus_id": "123"}]
-        mock_detect.return_value = []
-        mock_update_raw.side_effect = Exception("Sheets error")
-        
+        # Enough rows to trigger an immediate flush
+        rows = [["row"]] * get_bus_data._RAW_FLUSH_ROWS
+        mock_tick.return_value = ([""], rows, [])
+
         worksheets = {"raw_data": MagicMock()}
-        
-        # Should not raise exception, should handle gracefully
+        worksheets["raw_data"].append_rows.side_effect = Exception("Sheets error")
+
+        # Should not raise exception, should handle gracefully and keep
+        # the rows buffered for the next flush
         result = process_bus_data(filtered_buses, worksheets)
         assert result == []
+        assert get_bus_data._raw_buffer == rows
 
 
 class TestUpdateRouteSpecificSheets:
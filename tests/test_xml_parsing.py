@@ -38,10 +38,11 @@ class TestXMLParsing:
         mock_response = mocker.Mock()
         mock_response.status_code = 200
         mock_response.text = siri_xml
+        mock_response.content = siri_xml.encode()
         mock_response.headers = {"content-type": "text/xml"}
         mock_response.raise_for_status.return_value = None
 
-        mocker.patch("requests.get", return_value=mock_response)
+        mocker.patch("get_bus_data._SESSION.get", return_value=mock_response)
         mocker.patch("builtins.open", mock_open())
 
         result = get_bus_positions("test_api_key", "TEST")
@@ -61,10 +62,11 @@ class TestXMLParsing:
         mock_response = mocker.Mock()
         mock_response.status_code = 200
         mock_response.text = ""
+        mock_response.content = b""
         mock_response.headers = {"content-type": "text/xml"}
         mock_response.raise_for_status.return_value = None
 
-        mocker.patch("requests.get", return_value=mock_response)
+        mocker.patch("get_bus_data._SESSION.get", return_value=mock_response)
         mocker.patch("builtins.open", mock_open())
 
         result = get_bus_positions("test_api_key", "TEST")
@@ -76,19 +78,59 @@ class TestXMLParsing:
         mock_response = mocker.Mock()
         mock_response.status_code = 200
         mock_response.text = "Invalid XML content"
+        mock_response.content = b"Invalid XML content"
         mock_response.headers = {"content-type": "text/xml"}
         mock_response.raise_for_status.return_value = None
 
-        mocker.patch("requests.get", return_value=mock_response)
+        mocker.patch("get_bus_data._SESSION.get", return_value=mock_response)
         mocker.patch("builtins.open", mock_open())
 
         result = get_bus_positions("test_api_key", "TEST")
 
         assert result == {"entity": []}
 
-    def test_extract_stops_from_xml_with_coordinates(self, mocker):
+    def test_get_bus_positions_not_modified(self, mocker):
+        """Test that a 304 response returns the cached result without re-parsing."""
+        import get_bus_data
+
+        siri_xml = """<?xml version="1.0"?>
+        <Siri xmlns="http://www.siri.org.uk/siri">
+            <VehicleActivity>
+                <MonitoredVehicleJourney>
+                    <LineRef>TEST</LineRef>
+                    <VehicleLocation>
+                        <Longitude>-0.1278</Longitude>
+                        <Latitude>51.5074</Latitude>
+                    </VehicleLocation>
+                    <VehicleRef>BUS001</VehicleRef>
+                </MonitoredVehicleJourney>
+            </VehicleActivity>
+        </Siri>"""
+
+        first_response = mocker.Mock()
+        first_response.status_code = 200
+        first_response.content = siri_xml.encode()
+        first_response.headers = {"ETag": '"abc123"'}
+        first_response.raise_for_status.return_value = None
+
+        not_modified = mocker.Mock()
+        not_modified.status_code = 304
+
+        mock_get = mocker.patch(
+            "get_bus_data._SESSION.get", side_effect=[first_response, not_modified]
+        )
+        spy = mocker.spy(get_bus_data, "_iter_vehicle_activities")
+
+        first = get_bus_positions("test_api_key", "TEST")
+        second = get_bus_positions("test_api_key", "TEST")
+
+        # Second call sends the stored ETag and reuses the parsed result
+        assert mock_get.call_args.kwargs["headers"] == {"If-None-Match": '"abc123"'}
+        assert second == first
+        assert spy.call_count == 1
+
+    def test_extract_stops_from_xml_with_coordinates(self, tmp_path, monkeypatch):
         """Test extracting stops from TransXChange XML with coordinates."""
-        # Mock TransXChange XML with coordinates
         transxchange_xml = """<?xml version="1.0"?>
         <TransXChange xmlns="http://www.transxchange.org.uk/">
             <StopPoints>
@@ -130,9 +172,9 @@ class TestXMLParsing:
             </Services>
         </TransXChange>"""
 
-        # Mock file operations
-        mock_tree = ET.ElementTree(ET.fromstring(transxchange_xml))
-        mocker.patch("xml.etree.ElementTree.parse", return_value=mock_tree)
+        # Write a real timetable file - the extractor streams it from disk
+        (tmp_path / "timetable-TEST.xml").write_text(transxchange_xml)
+        monkeypatch.chdir(tmp_path)
 
         # Clear cache
         from get_bus_data import _stops_cache
@@ -147,16 +189,17 @@ class TestXMLParsing:
         assert stops[0]["lat"] == 51.5074
         assert stops[0]["lon"] == -0.1278
 
-    def test_extract_stops_caching(self, mocker):
+    def test_extract_stops_caching(self, tmp_path, monkeypatch, mocker):
         """Test that stop extraction results are cached."""
-        # Mock the parse function to track calls
-        mock_parse = mocker.patch("xml.etree.ElementTree.parse")
-
-        # Mock empty XML
-        empty_xml = ET.ElementTree(
-            ET.fromstring('<TransXChange xmlns="http://www.transxchange.org.uk/"></TransXChange>')
+        (tmp_path / "timetable-TEST.xml").write_text(
+            '<TransXChange xmlns="http://www.transxchange.org.uk/"></TransXChange>'
         )
-        mock_parse.return_value = empty_xml
+        monkeypatch.chdir(tmp_path)
+
+        # Spy on the streaming parser to track calls
+        import get_bus_data
+
+        spy = mocker.spy(get_bus_data, "_iter_timetable_elements")
 
         # Clear cache
         from get_bus_data import _stops_cache
@@ -165,8 +208,8 @@ class TestXMLParsing:
 
         # First call should parse XML
         extract_stops_from_xml("TEST", "inbound")
-        assert mock_parse.call_count == 1
+        assert spy.call_count == 1
 
         # Second call should use cache
         extract_stops_from_xml("TEST", "inbound")
-        assert mock_parse.call_count == 1  # Should not increase
+        assert spy.call_count == 1  # Should not increase